@@ -0,0 +1,101 @@
+"""
+Build time for very large boolean filter trees.
+
+Parses and compiles (to SQLite SQL) a wide `$or` of N leaves and deep
+`$or`/alternating `$and`/`$or` chains, for N up to 100k. Per-leaf time
+should stay flat as N grows.
+
+The optimizer is bypassed so the boolean tree is built as written (it
+would fold these equality runs into a single `IN`), and the filters are
+decoded with a local `FilterDecoder` whose size limits are lifted.
+
+    python benchmarks/bench_large_filters.py
+"""
+
+import json
+import sys
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, String, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Mapped, declarative_base, mapped_column
+
+from fastapi_querybuilder_jsonb.core import (
+    MAX_FILTER_NESTING,
+    compile_filter_tree,
+    parse_filter_query,
+    parse_filter_tree,
+)
+from fastapi_querybuilder_jsonb.decoder import FilterDecoder
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    qty: Mapped[int] = mapped_column(Integer)
+
+
+# orjson caps nesting at 1024 levels; the stdlib decoder only needs a
+# higher recursion limit.
+DECODER = FilterDecoder(loads=json.loads, max_bytes=None, max_depth=None, max_elements=None)
+
+
+def wide(n: int) -> dict:
+    return {"$or": [{"qty": {"$eq": i}} for i in range(n)]}
+
+
+def deep(n: int) -> dict:
+    # Alternating $and/$or, one level per leaf.
+    tree: dict = {"qty": {"$eq": 0}}
+    for i in range(1, n):
+        tree = {"$and" if i % 2 else "$or": [{"name": {"$eq": str(i)}}, tree]}
+    return tree
+
+
+def deep_same(n: int) -> dict:
+    # Nested $or inside $or; the parser flattens this to one n-ary OR.
+    tree: dict = {"qty": {"$eq": 0}}
+    for i in range(1, n):
+        tree = {"$or": [{"name": {"$eq": str(i)}}, tree]}
+    return tree
+
+
+def measure(label: str, filters: dict, compile_sql: bool = True) -> None:
+    raw = json.dumps(filters)
+    start = time.perf_counter()
+    tree = parse_filter_tree(Item, parse_filter_query(raw, DECODER))
+    expr, stmt = compile_filter_tree(Item, tree, select(Item))
+    stmt = stmt.where(expr)
+    built = time.perf_counter()
+    if compile_sql:
+        stmt.compile(dialect=sqlite.dialect())
+    done = time.perf_counter()
+    leaves = raw.count('"$eq"')
+    print(f"{label:>14} {leaves:>7} leaves: build {(built - start) * 1e3:9.1f} ms "
+          f"({(built - start) / leaves * 1e6:5.1f} us/leaf), compile {(done - built) * 1e3:9.1f} ms")
+
+
+def main() -> None:
+    sys.setrecursionlimit(20_000)
+
+    for n in (1_000, 10_000, 100_000):
+        measure("wide $or", wide(n))
+    for n in (1_000, 2_000):
+        measure("nested $or", deep_same(n))
+    # Alternating AND/OR cannot be flattened, and SQLAlchemy compiles it
+    # recursively, so the builder rejects it beyond MAX_FILTER_NESTING.
+    for n in (MAX_FILTER_NESTING // 2, MAX_FILTER_NESTING):
+        measure("alternating", deep(n))
+    try:
+        measure("alternating", deep(500))
+    except HTTPException as e:
+        print(f"{'alternating':>14} {500:>7} leaves: rejected ({e.detail})")
+
+
+if __name__ == "__main__":
+    main()
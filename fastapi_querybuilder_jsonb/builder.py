@@ -1,37 +1,57 @@
 from typing import Any
 
-from sqlalchemy import cast, select, or_, asc, desc, String, Enum, Select
+from sqlalchemy import cast, select, or_, asc, desc, String, Select
 from fastapi import HTTPException
 
-from .core import parse_filter_query, parse_filters, resolve_and_join_column
+from .catalog import get_model_catalog
+from .core import JoinPlanner, parse_filter_query, parse_filter_tree, compile_filter_tree
+from .operators import AGGREGATES
+from .optimizer import is_unsatisfiable, optimize_filter_tree
 from .params import QueryParams
+# Column type checks live in utils; kept importable from here for existing callers.
+from .utils import is_enum_column, is_string_column, is_integer_column, is_boolean_column  # noqa: F401
 
 
-def build_query(cls: Any, params: QueryParams, stmt: Select | None = None) -> Select:
+# Execution option set on statements whose filters can never match
+EMPTY_RESULT_OPTION = "querybuilder_empty_result"
+
+
+def is_empty_result(stmt: Select) -> bool:
+	"""Whether `build_query` proved that `stmt` returns no rows, so it need not be executed."""
+	return bool(stmt.get_execution_options().get(EMPTY_RESULT_OPTION))
+
+
+def build_query(cls: Any, params: QueryParams, stmt: Select | None = None, canonical_binds: bool = False) -> Select:
 	stmt = select(cls) if stmt is None else stmt
+	catalog = get_model_catalog(cls)
+	# Filters and sorting share one join per relationship path
+	planner = JoinPlanner(cls)
 
-	# Filters
+	# Filters: decode, parse into the filter AST, simplify it, then compile it to SQL
 	parsed_filters = parse_filter_query(params.filters)
 	if parsed_filters:
-		filter_expr, stmt = parse_filters(cls, parsed_filters, stmt)
+		filter_tree = optimize_filter_tree(cls, parse_filter_tree(cls, parsed_filters))
+		filter_expr, stmt = compile_filter_tree(cls, filter_tree, stmt, canonical_binds, planner)
 		if filter_expr is not None:
 			stmt = stmt.where(filter_expr)
+		if is_unsatisfiable(filter_tree):
+			# Compiles to WHERE false; callers can skip the round trip entirely
+			stmt = stmt.execution_options(**{EMPTY_RESULT_OPTION: True})
 
 	# Search - ONLY in safe columns
 	if params.search:
 		search_expr = []
 
-		for column in cls.__table__.columns:
-			if is_enum_column(column):
-				search_expr.append(cast(column, String).ilike(f"%{params.search}%"))
-			elif is_string_column(column):
-				search_expr.append(column.ilike(f"%{params.search}%"))
-			elif is_integer_column(column):
-				if params.search.isdigit():
-					search_expr.append(column == int(params.search))
-			elif is_boolean_column(column):
-				if params.search.lower() in ("true", "false"):
-					search_expr.append(column == (params.search.lower() == "true"))
+		for column in catalog.enum_columns:
+			search_expr.append(cast(column, String).ilike(f"%{params.search}%"))
+		for column in catalog.string_columns:
+			search_expr.append(column.ilike(f"%{params.search}%"))
+		if params.search.isdigit():
+			for column in catalog.integer_columns:
+				search_expr.append(column == int(params.search))
+		if params.search.lower() in ("true", "false"):
+			for column in catalog.boolean_columns:
+				search_expr.append(column == (params.search.lower() == "true"))
 
 		if search_expr:
 			stmt = stmt.where(or_(*search_expr))
@@ -43,13 +63,16 @@ def build_query(cls: Any, params: QueryParams, stmt: Select | None = None) -> Se
 		except ValueError:
 			sort_field, sort_dir = params.sort, "asc"
 
-		column = getattr(cls, sort_field, None)
+		column = catalog.attributes.get(sort_field)
 		if column is None:
 			nested_keys = sort_field.split(".")
-			if len(nested_keys) > 1:
-				joins = {}
-				column, stmt = resolve_and_join_column(
-					cls, nested_keys, stmt, joins)
+			promoted = catalog.promoted_paths.get((nested_keys[0], tuple(nested_keys[1:])))
+			if promoted is not None:
+				column = catalog.attributes[promoted]
+			elif len(nested_keys) > 1 and nested_keys[-1] in AGGREGATES:
+				column = planner.aggregate(nested_keys[:-1], nested_keys[-1])
+			elif len(nested_keys) > 1:
+				column = planner.resolve(nested_keys)
 			else:
 				raise HTTPException(
 					status_code=400, detail=f"Invalid sort field: {sort_field}")
@@ -57,24 +80,5 @@ def build_query(cls: Any, params: QueryParams, stmt: Select | None = None) -> Se
 		stmt = stmt.order_by(
 			asc(column) if sort_dir.lower() == "asc" else desc(column))
 
-	return stmt
-
-
-def is_enum_column(column):
-	"""Check if a column is an enum type"""
-	return isinstance(column.type, Enum)
-
-
-def is_string_column(column):
-	"""Check if a column is a string type"""
-	return isinstance(column.type, String)
-
-
-def is_integer_column(column):
-	"""Check if a column is an integer type"""
-	return hasattr(column.type, "python_type") and column.type.python_type is int
-
+	return planner.apply(stmt)
 
-def is_boolean_column(column):
-	"""Check if a column is a boolean type"""
-	return hasattr(column.type, "python_type") and column.type.python_type is bool
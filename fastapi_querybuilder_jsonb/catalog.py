@@ -0,0 +1,160 @@
+# fastapi_querybuilder_jsonb/catalog.py
+
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Mapper
+
+from .generated import PROMOTED_JSON_PATH
+from .utils import (
+    is_boolean_column,
+    is_enum_column,
+    is_integer_column,
+    is_jsonb_column,
+    is_string_column,
+)
+
+
+class RelationshipInfo:
+    """A relationship attribute together with the mapper it points at."""
+
+    __slots__ = ("attribute", "mapper", "target", "uselist")
+
+    def __init__(self, attribute: Any, mapper: Mapper, uselist: bool):
+        self.attribute = attribute
+        self.mapper = mapper
+        self.target = mapper.class_
+        self.uselist = uselist
+
+
+# How filters reach through to-many relationships: "exists" compiles a
+# correlated EXISTS per relationship, "join" outer joins (one row per child).
+TO_MANY_STRATEGIES = ("exists", "join")
+
+# How conditions on paths inside JSONB columns compile: "operators" builds one
+# expression per condition, "jsonpath" combines the conditions on a column
+# into one `@@` jsonpath predicate on PostgreSQL.
+JSON_BACKENDS = ("operators", "jsonpath")
+
+
+class ModelCatalog:
+    """
+    Immutable metadata for one mapped model, computed once so the request
+    path only does dictionary lookups instead of SQLAlchemy introspection.
+
+    A model can set `__querybuilder_to_many__ = "join"` to filter through
+    its to-many relationships with outer joins instead of EXISTS, and
+    `__querybuilder_json_backend__ = "jsonpath"` to filter its JSONB
+    columns with jsonpath predicates.
+
+    `promoted_paths` maps `(json column, path keys)` to the attribute of a
+    generated column declared with `json_path_column` for that path.
+    """
+
+    __slots__ = (
+        "model",
+        "attributes",
+        "enum_columns",
+        "string_columns",
+        "integer_columns",
+        "boolean_columns",
+        "json_columns",
+        "relationships",
+        "promoted_paths",
+        "to_many",
+        "json_backend",
+    )
+
+    model: Any
+    attributes: Mapping[str, Any]
+    enum_columns: Tuple[Any, ...]
+    string_columns: Tuple[Any, ...]
+    integer_columns: Tuple[Any, ...]
+    boolean_columns: Tuple[Any, ...]
+    json_columns: Mapping[str, Any]
+    relationships: Mapping[str, RelationshipInfo]
+    promoted_paths: Mapping[Tuple[str, Tuple[str, ...]], str]
+    to_many: str
+    json_backend: str
+
+    def __init__(self, model: Any):
+        mapper = inspect(model)
+
+        attributes = {
+            key: getattr(model, key) for key in mapper.all_orm_descriptors.keys()
+            if key != "__mapper__"
+        }
+        relationships = {
+            rel.key: RelationshipInfo(getattr(model, rel.key), rel.mapper, rel.uselist)
+            for rel in mapper.relationships
+        }
+        json_columns = {
+            key: attribute for key, attribute in attributes.items()
+            if key not in relationships and hasattr(attribute, "type") and is_jsonb_column(attribute)
+        }
+        promoted_paths = {
+            prop.columns[0].info[PROMOTED_JSON_PATH]: prop.key
+            for prop in mapper.column_attrs
+            if PROMOTED_JSON_PATH in prop.columns[0].info
+        }
+
+        to_many = getattr(model, "__querybuilder_to_many__", "exists")
+        if to_many not in TO_MANY_STRATEGIES:
+            raise ValueError(
+                f"{model.__name__}.__querybuilder_to_many__ must be one of {TO_MANY_STRATEGIES}, got {to_many!r}")
+        json_backend = getattr(model, "__querybuilder_json_backend__", "operators")
+        if json_backend not in JSON_BACKENDS:
+            raise ValueError(
+                f"{model.__name__}.__querybuilder_json_backend__ must be one of {JSON_BACKENDS}, got {json_backend!r}")
+
+        # Search groups follow the same precedence as the search loop:
+        # Enum is a String subclass, so it has to be checked first.
+        groups: Dict[str, list] = {"enum": [], "string": [], "integer": [], "boolean": []}
+        for column in model.__table__.columns:
+            if is_enum_column(column):
+                groups["enum"].append(column)
+            elif is_string_column(column):
+                groups["string"].append(column)
+            elif is_integer_column(column):
+                groups["integer"].append(column)
+            elif is_boolean_column(column):
+                groups["boolean"].append(column)
+
+        _set = object.__setattr__
+        _set(self, "model", model)
+        _set(self, "attributes", MappingProxyType(attributes))
+        _set(self, "enum_columns", tuple(groups["enum"]))
+        _set(self, "string_columns", tuple(groups["string"]))
+        _set(self, "integer_columns", tuple(groups["integer"]))
+        _set(self, "boolean_columns", tuple(groups["boolean"]))
+        _set(self, "json_columns", MappingProxyType(json_columns))
+        _set(self, "relationships", MappingProxyType(relationships))
+        _set(self, "promoted_paths", MappingProxyType(promoted_paths))
+        _set(self, "to_many", to_many)
+        _set(self, "json_backend", json_backend)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        return f"<ModelCatalog {self.model.__name__}>"
+
+
+_CATALOGS: Dict[Any, ModelCatalog] = {}
+_CATALOGS_LOCK = Lock()
+
+
+def get_model_catalog(model: Any) -> ModelCatalog:
+    """Return the catalog for `model`, building and registering it on first use."""
+    catalog = _CATALOGS.get(model)
+    if catalog is None:
+        with _CATALOGS_LOCK:
+            catalog = _CATALOGS.get(model)
+            if catalog is None:
+                catalog = _CATALOGS[model] = ModelCatalog(model)
+    return catalog
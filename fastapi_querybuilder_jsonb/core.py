@@ -1,13 +1,45 @@
 # app/filters/core.py
 
 from fastapi import HTTPException
-from sqlalchemy.orm import RelationshipProperty, aliased
-from sqlalchemy.sql import Select, and_
-from sqlalchemy import cast, Integer, DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Boolean, Integer, Numeric, String, inspect, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import ClauseElement, Select, and_, or_, not_, false, func, literal
 from typing import Any, Optional, Dict, Tuple
-import json
-from .operators import LOGICAL_OPERATORS, COMPARISON_OPERATORS
-from .utils import is_jsonb_column
+from .nodes import (
+    Aggregate,
+    And,
+    Compare,
+    JsonPathCompare,
+    Never,
+    Node,
+    Not,
+    Or,
+    Quantified,
+    RelationshipCompare,
+    fold,
+)
+from .operators import (
+    AGGREGATES,
+    LOGICAL_NODES,
+    LOGICAL_OPERATORS,
+    QUANTIFIERS,
+    JSON_DOCUMENT,
+    JSON_PATH_LEAF,
+    JSONB_CONTAINMENT,
+    SCALAR_COLUMN,
+    JsonPathLeaf,
+    OperatorSpec,
+    get_operator,
+    json_path_kind,
+    json_value_type,
+    jsonb_variant_operator,
+)
+from .cache import LRUCache
+from .catalog import get_model_catalog
+from .decoder import FILTER_DECODER, FilterDecoder
+from .jsonpath import JSONPATH_OPERATORS, JsonPathMatch, jsonpath_condition, supports_jsonpath
+from .optimizer import optimize_filter_tree
 
 
 def apply_jsonb_path_filter(column, path: str, operator: str, operand: Any) -> Any:
@@ -23,77 +55,76 @@ def apply_jsonb_path_filter(column, path: str, operator: str, operand: Any) -> A
     Returns:
         SQLAlchemy expression
     """
-    from sqlalchemy.sql import operators as sql_operators
-    from sqlalchemy.dialects.postgresql import JSONB
+    spec = _json_path_column_operator(column, operator)
+    return spec(JsonPathLeaf(column, tuple(path.split("."))), operand)
 
-    # Navigate the path
-    expr = column
-    for key in path.split("."):
-        expr = expr[key]
 
-    # Get the text value - handle both JSONB and JSON
-    # For JSONB (PostgreSQL), use .astext
-    # For JSON (SQLite, MySQL), the subscript already returns a scalar-like expression
-    if isinstance(column.type, JSONB):
-        leaf = expr.astext
-    else:
-        # For regular JSON columns, we need to extract as text
-        # SQLite JSON uses json_extract which returns text by default
-        leaf = expr
-
-    # Map operators to their functions
-    operator_map = {
-        "$eq": lambda leaf, val: sql_operators.eq(leaf, str(val)),
-        "$ne": lambda leaf, val: sql_operators.ne(leaf, str(val)),
-        "$gt": lambda leaf, val: sql_operators.gt(cast(leaf, Integer), val),
-        "$gte": lambda leaf, val: sql_operators.ge(cast(leaf, Integer), val),
-        "$lt": lambda leaf, val: sql_operators.lt(cast(leaf, Integer), val),
-        "$lte": lambda leaf, val: sql_operators.le(cast(leaf, Integer), val),
-        "$in": lambda leaf, val: sql_operators.in_op(leaf, [str(v) for v in val]),
-        "$contains": lambda leaf, val: cast(leaf, String).ilike(f"%{val}%"),
-        "$startswith": lambda leaf, val: cast(leaf, String).ilike(f"{val}%"),
-        "$endswith": lambda leaf, val: cast(leaf, String).ilike(f"%{val}"),
-        "$isempty": lambda leaf, val: leaf.is_(None),
-        "$isnotempty": lambda leaf, val: leaf.is_not(None),
-    }
-
-    if operator not in operator_map:
+def _json_path_operator(operator: str, kind: str = JSON_PATH_LEAF, canonical: bool = False) -> OperatorSpec:
+    spec = get_operator(operator, kind, canonical)
+    if spec is None:
         raise HTTPException(
             status_code=400,
             detail=f"Operator '{operator}' is not supported for JSONB path filtering"
         )
+    return spec
 
-    # Apply the operator (some operators don't use operand)
-    if operator in ["$isempty", "$isnotempty"]:
-        return operator_map[operator](leaf, None)
-    else:
-        return operator_map[operator](leaf, operand)
 
+def _json_path_column_operator(column, operator: str, canonical: bool = False) -> OperatorSpec:
+    """
+    The operator for paths inside `column`. On a JSON column with a JSONB
+    variant every operator reads the path as JSONB (`->>`) on PostgreSQL,
+    so one column gets the same expressions (and indexes) whatever the operator.
+    """
+    spec = _json_path_operator(operator, json_path_kind(column), canonical)
+    if supports_jsonpath(column) and not isinstance(column.type, JSONB):
+        spec = jsonb_variant_operator(spec, _json_path_operator(operator, JSON_PATH_LEAF, canonical))
+    return spec
 
-def resolve_and_join_column(model, nested_keys: list[str], query: Select, joins: dict) -> Tuple[Any, Select]:
-    current_model = model
-    alias = None
 
-    for i, attr in enumerate(nested_keys):
-        relationship = getattr(current_model, attr, None)
+class JoinPath:
+    """
+    A dotted key resolved against a model: the relationship hops to follow,
+    in order, as `(relationship attribute name, related model)` pairs, and
+    the attribute to read on the last one. Aliases are created from these
+    templates only when a statement actually needs the join.
+    """
 
-        if relationship is not None and isinstance(relationship.property, RelationshipProperty):
-            related_model = relationship.property.mapper.class_
-            if related_model not in joins:
-                alias = aliased(related_model)
-                joins[related_model] = alias
-                query = query.outerjoin(alias, getattr(current_model, attr))
-            else:
-                alias = joins[related_model]
+    __slots__ = ("hops", "attribute")
+
+    def __init__(self, hops: tuple, attribute: str):
+        self.hops = hops
+        self.attribute = attribute
 
-            current_model = alias
+
+PATH_CACHE = LRUCache(maxsize=1024)
+
+
+def resolve_join_path(model, nested_keys: list[str]) -> JoinPath:
+    cache_key = (model, tuple(nested_keys))
+    path = PATH_CACHE.get(cache_key)
+    if path is None:
+        path = _build_join_path(model, nested_keys)
+        PATH_CACHE.put(cache_key, path)
+    return path
+
+
+def _build_join_path(model, nested_keys: list[str]) -> JoinPath:
+    current_catalog = get_model_catalog(model)
+    hops = []
+
+    for attr in nested_keys:
+        relationship = current_catalog.relationships.get(attr)
+
+        if relationship is not None:
+            hops.append((attr, relationship.target))
+            current_catalog = get_model_catalog(relationship.target)
         else:
-            if hasattr(current_model, attr):
-                return getattr(current_model, attr), query
+            if attr in current_catalog.attributes:
+                return JoinPath(tuple(hops), attr)
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid filter key: {'.'.join(nested_keys)}. "
-                f"Could not resolve attribute '{attr}' in model '{current_model.__name__}'."
+                f"Could not resolve attribute '{attr}' in model '{current_catalog.model.__name__}'."
             )
     raise HTTPException(
         status_code=400,
@@ -101,82 +132,720 @@ def resolve_and_join_column(model, nested_keys: list[str], query: Select, joins:
     )
 
 
-def parse_filters(model, filters: dict, query: Select) -> Tuple[Optional[Any], Select]:
-    expressions = []
-    joins = {}
+def relationship_join_path(model, nested_keys: list[str]) -> JoinPath:
+    """A dotted key naming relationships only (`roles.users`), as a JoinPath with no attribute."""
+    catalog = get_model_catalog(model)
+    hops = []
+    for attr in nested_keys:
+        relationship = catalog.relationships.get(attr)
+        if relationship is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid filter key: {'.'.join(nested_keys)}. "
+                f"'{attr}' is not a relationship of model '{catalog.model.__name__}'."
+            )
+        hops.append((attr, relationship.target))
+        catalog = get_model_catalog(relationship.target)
+    return JoinPath(tuple(hops), None)
+
 
-    if not isinstance(filters, dict):
+def resolve_aggregate_path(model, nested_keys: list[str]) -> JoinPath:
+    """
+    The rows an aggregate runs over: a relationship path (`roles.users`),
+    whose rows are counted, or one ending in an attribute (`orders.total`).
+    """
+    catalog = get_model_catalog(model)
+    for attr in nested_keys:
+        relationship = catalog.relationships.get(attr)
+        if relationship is None:
+            break
+        catalog = get_model_catalog(relationship.target)
+    else:
+        return relationship_join_path(model, nested_keys)
+    join_path = resolve_join_path(model, nested_keys)
+    if not join_path.hops:
         raise HTTPException(
-            status_code=400, detail="Filters must be a dictionary")
+            status_code=400,
+            detail=f"Aggregates need a relationship path, got '{'.'.join(nested_keys)}'")
+    return join_path
+
+
+def resolve_column_path(model, nested_keys: list[str], joins: dict) -> Tuple[Any, list]:
+    """
+    Follow a dotted attribute path from `model`, aliasing every relationship
+    hop that `joins` does not already hold. Returns the final column and
+    the `(alias, onclause)` outer joins the caller still has to apply.
+    """
+    path = resolve_join_path(model, nested_keys)
+    current_model = model
+    new_joins = []
+
+    for attr, related_model in path.hops:
+        alias = joins.get(related_model)
+        if alias is None:
+            alias = aliased(related_model)
+            joins[related_model] = alias
+            new_joins.append((alias, getattr(current_model, attr)))
+        current_model = alias
+
+    return getattr(current_model, path.attribute), new_joins
+
+
+def resolve_and_join_column(model, nested_keys: list[str], query: Select, joins: dict) -> Tuple[Any, Select]:
+    column, new_joins = resolve_column_path(model, nested_keys, joins)
+    for alias, onclause in new_joins:
+        query = query.outerjoin(alias, onclause)
+    return column, query
+
+
+class ExistsHop:
+    """A relationship followed inside a correlated subquery, and the alias it reaches."""
+
+    __slots__ = ("attribute", "entity")
+
+    def __init__(self, attribute, entity):
+        self.attribute = attribute
+        self.entity = entity
+
+
+class JoinPlanner:
+    """
+    The outer joins of one statement, keyed by relationship path.
 
-    for key, value in filters.items():
-        if key in LOGICAL_OPERATORS:
-            if not isinstance(value, list):
+    Filters, sorting and anything else that reaches through a relationship
+    resolve their keys here, so each relationship path is joined exactly
+    once per statement, and two different paths to the same model (e.g.
+    `author` and `editor`, both `User`) get separate aliases. Filters on
+    to-many relationships use `exists_hop` instead and add no join.
+
+    A planner for the inside of a correlated subquery reads `model` through
+    `entity`, an alias of it; nothing can be joined there, so every
+    relationship is followed with EXISTS.
+    """
+
+    __slots__ = ("model", "entity", "aliases", "joins", "subquery_hops")
+
+    def __init__(self, model, entity=None):
+        self.model = model
+        self.entity = model if entity is None else entity
+        self.aliases: Dict[tuple, Any] = {}
+        self.joins: list = []  # (relationship path, alias, onclause), in join order
+        self.subquery_hops: Dict[tuple, ExistsHop] = {}
+
+    def resolve(self, nested_keys: list[str]) -> Any:
+        """Return the column for a dotted key, planning any joins it needs."""
+        join_path = resolve_join_path(self.model, nested_keys)
+        return getattr(self.entity_for(join_path), join_path.attribute)
+
+    def entity_for(self, join_path: JoinPath) -> Any:
+        """The model (or alias) reached by following the hops of `join_path`."""
+        entity = self.entity
+        path: tuple = ()
+        for attr, related_model in join_path.hops:
+            path += (attr,)
+            alias = self.aliases.get(path)
+            if alias is None:
+                alias = aliased(related_model)
+                self.aliases[path] = alias
+                self.joins.append((path, alias, getattr(entity, attr)))
+            entity = alias
+        return entity
+
+    def exists_hop(self, join_path: JoinPath, index: int, entity) -> "ExistsHop":
+        """
+        The hop at `index` of `join_path` as a correlated subquery from
+        `entity`. Hops are aliased once per relationship path, so leaves on
+        the same related rows can share one EXISTS.
+        """
+        path = tuple(attr for attr, _ in join_path.hops[:index + 1])
+        hop = self.subquery_hops.get(path)
+        if hop is None:
+            attr, related_model = join_path.hops[index]
+            alias = aliased(related_model)
+            hop = self.subquery_hops[path] = ExistsHop(getattr(entity, attr).of_type(alias), alias)
+        return hop
+
+    def aggregate(self, nested_keys: list[str], aggregate: str) -> Any:
+        """
+        A correlated scalar subquery applying `aggregate` (a key of
+        AGGREGATES) to the rows reached through `nested_keys`, e.g.
+        `(SELECT count(*) FROM users AS users_1 WHERE roles.id = users_1.role_id)`.
+        """
+        join_path = resolve_aggregate_path(self.model, nested_keys)
+        if join_path.attribute is None and aggregate != "$count":
+            raise HTTPException(
+                status_code=400,
+                detail=f"Aggregate '{aggregate}' needs an attribute, e.g. '{'.'.join(nested_keys)}.<field>'")
+        entity = self.entity
+        hops = []
+        for index in range(len(join_path.hops)):
+            hop = self.exists_hop(join_path, index, entity)
+            hops.append(hop)
+            entity = hop.entity
+        if join_path.attribute is None:
+            value = AGGREGATES[aggregate]()
+        else:
+            value = AGGREGATES[aggregate](getattr(entity, join_path.attribute))
+            if aggregate == "$sum":
+                value = func.coalesce(value, literal(0, value.type))  # no rows sum to 0
+        # The first hop is correlated to this planner's entity; later hops are joined.
+        rows = _correlated_select(value, self.entity, hops[0])
+        for hop in hops[1:]:
+            rows = rows.join(hop.entity, hop.attribute)
+        return rows.scalar_subquery()
+
+    def adopt(self, joins: list) -> None:
+        """Take over joins planned elsewhere (e.g. by a cached `FilterPlan`)."""
+        for path, alias, onclause in joins:
+            existing = self.aliases.get(path)
+            if existing is alias:
+                continue
+            if existing is None:
+                self.aliases[path] = alias
+            self.joins.append((path, alias, onclause))
+
+    def apply(self, query: Select) -> Select:
+        for _, alias, onclause in self.joins:
+            query = query.outerjoin(alias, onclause)
+        return query
+
+
+def parse_filter_tree(model, filters: dict) -> Node:
+    """
+    Parse a decoded filter dict into the filter AST, resolving every key
+    against `model`. Keys and operators are visited in sorted order so
+    equivalent filters produce the same tree, and nested `$and`/`$or` runs
+    are flattened into single n-ary nodes.
+
+    The walk uses an explicit stack: very deep or very wide filters cost
+    linear time and never hit the recursion limit.
+    """
+    catalog = get_model_catalog(model)
+    # ("visit", dict) expands a filter dict; ("build", items) assembles the
+    # node for a dict once the results of its nested dicts are available.
+    tasks: list = [("visit", filters)]
+    results: list = []
+
+    while tasks:
+        action, payload = tasks.pop()
+
+        if action == "visit":
+            if not isinstance(payload, dict):
                 raise HTTPException(
-                    status_code=400, detail=f"Logical operator '{key}' must be a list")
-            sub_expressions = []
-            for sub_filter in value:
-                sub_expr, query = parse_filters(model, sub_filter, query)
-                if sub_expr is not None:
-                    sub_expressions.append(sub_expr)
-            if sub_expressions:
-                expressions.append(LOGICAL_OPERATORS[key](*sub_expressions))
-
-        elif isinstance(value, dict):
-            nested_keys = key.split(".")
-
-            # Check if the first key is a JSONB column
-            first_attr = nested_keys[0]
-            if hasattr(model, first_attr):
-                first_column = getattr(model, first_attr)
-                # Check if it's a JSONB column and we have a nested path
-                if len(nested_keys) > 1 and hasattr(first_column, 'type') and is_jsonb_column(first_column):
-                    # This is a JSONB path query (e.g., "metadata.key")
-                    jsonb_column = first_column
-                    jsonb_path = ".".join(nested_keys[1:])  # Everything after the column name
-
-                    for operator, operand in value.items():
-                        try:
-                            expressions.append(
-                                apply_jsonb_path_filter(jsonb_column, jsonb_path, operator, operand)
-                            )
-                        except Exception as e:
-                            raise HTTPException(
-                                status_code=400, detail=f"Error filtering JSONB path '{key}': {e}")
-                    continue  # Skip the normal resolution logic
-
-            # Normal column or relationship resolution
-            column, query = resolve_and_join_column(
-                model, nested_keys, query, joins)
-            for operator, operand in value.items():
-                if operator not in COMPARISON_OPERATORS:
-                    raise HTTPException(
-                        status_code=400, detail=f"Unknown operator '{operator}' for field '{key}'")
-                try:
-                    if operator in ["$isempty", "$isnotempty"]:
-                        expressions.append(
-                            COMPARISON_OPERATORS[operator](column))
-                    else:
-                        expressions.append(
-                            COMPARISON_OPERATORS[operator](column, operand))
-                except Exception as e:
+                    status_code=400, detail="Filters must be a dictionary")
+            items = []
+            sub_filters = []
+            for key in sorted(payload):
+                value = payload[key]
+                if key in LOGICAL_OPERATORS:
+                    if key == "$not" and isinstance(value, dict):
+                        value = [value]
+                    if not isinstance(value, list):
+                        expected = "an object or a list" if key == "$not" else "a list"
+                        raise HTTPException(
+                            status_code=400, detail=f"Logical operator '{key}' must be {expected}")
+                    items.append((key, len(value)))
+                    sub_filters.extend(value)
+                elif isinstance(value, dict):
+                    items.extend(_parse_leaves(model, catalog, key, value))
+                else:
                     raise HTTPException(
-                        status_code=400, detail=f"Error filtering '{key}': {e}")
+                        status_code=400, detail=f"Invalid filter format for key '{key}': {value}")
+            tasks.append(("build", items))
+            tasks.extend(("visit", sub_filter) for sub_filter in reversed(sub_filters))
+            continue
+
+        nested_count = sum(item[1] for item in payload if isinstance(item, tuple))
+        nested = results[len(results) - nested_count:]
+        del results[len(results) - nested_count:]
+        children = []
+        position = 0
+        for item in payload:
+            if isinstance(item, tuple):
+                key, count = item
+                children.append(LOGICAL_NODES[key](nested[position:position + count]))
+                position += count
+            else:
+                children.append(item)
+        results.append(And.of(children))
+
+    tree = results[0]
+    # The root is always an And so callers can rely on a group node.
+    return tree if isinstance(tree, And) else And([tree])
+
+
+# Operators that mean the same on a promoted column as on the JSON path it
+# copies. The others (`$exists`, `$ne`, `$elemMatch`, `$size`, ...) stay on
+# the path, as do "" and null operands, which a scalar column reads as IS NULL.
+PROMOTED_OPERATORS = frozenset(("$eq", "$gt", "$gte", "$lt", "$lte", "$in"))
+PROMOTED_TEXT_OPERATORS = frozenset(("$contains", "$startswith"))
+PROMOTED_EMPTINESS_OPERATORS = frozenset(("$isempty", "$isnotempty"))
+
+
+def _reads_as_promoted(column_type, operator: str, operand: Any) -> bool:
+    """Whether a condition on a promoted path matches the same rows on the promoted column."""
+    if column_type is None:
+        return False
+    if operator in PROMOTED_EMPTINESS_OPERATORS:
+        return True
+    if operator in PROMOTED_TEXT_OPERATORS:
+        return isinstance(column_type, String) and isinstance(operand, str) and operand != ""
+    if operator not in PROMOTED_OPERATORS:
+        return False
+    values = operand if isinstance(operand, list) else [operand]
+    return all(_same_comparison_type(column_type, value) for value in values)
+
+
+def _same_comparison_type(column_type, value: Any) -> bool:
+    # The JSON path compares by the operand's type (see `json_value_type`)
+    value_type = json_value_type(value)
+    if value_type is None:
+        return isinstance(value, str) and value != "" and isinstance(column_type, String)
+    if isinstance(value_type, Boolean):
+        return isinstance(column_type, Boolean)
+    return isinstance(column_type, (Integer, Numeric))
+
+
+def _parse_leaves(model, catalog, key: str, conditions: dict) -> list:
+    nested_keys = key.split(".")
+    operators = sorted(conditions)
+
+    # A JSONB column followed by a nested path (e.g., "metadata.key")
+    if len(nested_keys) > 1 and nested_keys[0] in catalog.json_columns:
+        path = tuple(nested_keys[1:])  # Everything after the column name
+        # A path promoted to a generated column is filtered on that column
+        promoted = catalog.promoted_paths.get((nested_keys[0], path))
+        promoted_type = catalog.attributes[promoted].type if promoted is not None else None
+        return [
+            Compare(promoted, op, conditions[op]) if _reads_as_promoted(promoted_type, op, conditions[op])
+            else JsonPathCompare(nested_keys[0], path, op, conditions[op])
+            for op in operators
+        ]
+
+    # A relationship path with a nested filter on the related rows
+    if any(op in QUANTIFIERS for op in operators):
+        if not all(op in QUANTIFIERS for op in operators):
+            raise HTTPException(
+                status_code=400, detail=f"Quantifiers on '{key}' cannot be combined with other operators")
+        related_model = relationship_join_path(model, nested_keys).hops[-1][1]
+        return [Quantified(nested_keys, op, parse_filter_tree(related_model, conditions[op])) for op in operators]
+
+    # An aggregate over related rows, compared like a column
+    if any(op in AGGREGATES for op in operators):
+        if not all(op in AGGREGATES for op in operators):
+            raise HTTPException(
+                status_code=400, detail=f"Aggregates on '{key}' cannot be combined with other operators")
+        join_path = resolve_aggregate_path(model, nested_keys)
+        relationships = tuple(attr for attr, _ in join_path.hops)
+        leaves = []
+        for aggregate in operators:
+            comparisons = conditions[aggregate]
+            if not isinstance(comparisons, dict):
+                raise HTTPException(
+                    status_code=400, detail=f"Aggregate '{aggregate}' on '{key}' takes an object of operators")
+            leaves.extend(Aggregate(relationships, join_path.attribute, aggregate, op, comparisons[op])
+                          for op in sorted(comparisons))
+        return leaves
+
+    # Normal column or relationship resolution
+    join_path = resolve_join_path(model, nested_keys)
+    if join_path.hops:
+        relationships = tuple(attr for attr, _ in join_path.hops)
+        return [RelationshipCompare(relationships, join_path.attribute, op, conditions[op]) for op in operators]
+    return [Compare(join_path.attribute, op, conditions[op]) for op in operators]
+
+
+class FilterPlan:
+    """
+    A filter shape compiled against a model: the joins it needs, as
+    `(relationship path, alias, onclause)`, and one expression builder per
+    leaf operator. Binding a plan to the operands of a request skips
+    attribute resolution and operator dispatch.
+    """
+
+    __slots__ = ("joins", "root")
+
+    def __init__(self, joins: list, root: Any):
+        self.joins = joins
+        self.root = root
+
+    def apply(self, query: Select) -> Select:
+        for _, alias, onclause in self.joins:
+            query = query.outerjoin(alias, onclause)
+        return query
+
+    def bind(self, tree: Node) -> Optional[Any]:
+        return _bind_step(self.root, tree.iter_values())
+
+
+PLAN_CACHE = LRUCache(maxsize=512)
+
+# SQLAlchemy compiles nested AND/OR/NOT groups recursively, several stack
+# frames per level, and only when the statement is executed, long after
+# `build_query` returned. Deeper filters are rejected while planning them
+# so they fail with a 400 instead of a RecursionError at execution.
+MAX_FILTER_NESTING = 64
+
+
+def filter_nesting(tree: Node) -> int:
+    """Levels of nested groups (`$and`/`$or`/`$not`, quantifier subqueries) in `tree`."""
+    def combine(node: Node, child_depths: list) -> int:
+        if isinstance(node, Quantified):
+            return filter_nesting(node.child) + 1
+        return max(child_depths) + 1 if child_depths else 0
+    return fold(tree, combine)
+
+
+def get_filter_plan(model, tree: Node, canonical_binds: bool = False) -> FilterPlan:
+    cache_key = (model, tree.shape(), canonical_binds)
+    plan = PLAN_CACHE.get(cache_key)
+    if plan is None:
+        if filter_nesting(tree) > MAX_FILTER_NESTING:
+            raise HTTPException(
+                status_code=400, detail=f"Filter nesting exceeds depth {MAX_FILTER_NESTING}")
+        planner = JoinPlanner(model)
+        try:
+            root = fold(tree, lambda node, child_steps: _compile_node(
+                model, node, child_steps, planner, canonical_binds))
+        except RecursionError:
+            raise HTTPException(
+                status_code=400, detail="Filter is nested too deeply to compile") from None
+        plan = FilterPlan(planner.joins, root)
+        PLAN_CACHE.put(cache_key, plan)
+    return plan
+
+
+def _compile_node(model, node: Node, child_steps: list, planner: JoinPlanner, canonical: bool) -> Any:
+    if isinstance(node, And):
+        return (and_, _group_leaf_steps(child_steps))
+    if isinstance(node, Or):
+        return (or_, child_steps)
+    if isinstance(node, Not):
+        return (not_, child_steps)
+    if isinstance(node, Never):
+        return false()
+
+    if isinstance(node, Quantified):
+        return _compile_quantified(model, node, planner, canonical)
+    if isinstance(node, Aggregate):
+        keys = [*node.relationships, node.attribute] if node.attribute else list(node.relationships)
+        spec = get_operator(node.operator, SCALAR_COLUMN, canonical)
+        if spec is None:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown operator '{node.operator}' for '{node.key}' {node.aggregate}")
+        return _operator_leaf(f"'{node.key}' {node.aggregate}", planner.aggregate(keys, node.aggregate), spec)
+
+    catalog = get_model_catalog(model)
+    if isinstance(node, JsonPathCompare):
+        column = catalog.json_columns[node.column]
+        if planner.entity is not model:
+            column = getattr(planner.entity, node.column)
+        leaf = JsonPathLeaf(column, node.path)
+        label = f"JSONB path '{'.'.join((node.column, *node.path))}'"
+        build = _operator_leaf(label, leaf, _json_path_column_operator(column, node.operator, canonical))
+        # Columns opted out of containment keep their text comparisons here too.
+        if (catalog.json_backend == "jsonpath" and node.operator in JSONPATH_OPERATORS
+                and supports_jsonpath(column) and column.info.get(JSONB_CONTAINMENT, True)):
+            return _JsonPathLeaf(node.column, column.__clause_element__(),
+                                 _jsonpath_term(label, node.path, node.operator, build))
+        return build
+
+    exists_hops = None
+    if isinstance(node, RelationshipCompare):
+        key = node.key
+        join_path = resolve_join_path(model, [*node.relationships, node.attribute])
+        split = 0 if planner.entity is not model else _first_to_many_hop(model, join_path)
+        if split is None:
+            column = getattr(planner.entity_for(join_path), join_path.attribute)
         else:
+            # To-one hops before the first to-many one are still joined; the
+            # rest are followed inside correlated EXISTS subqueries.
+            entity = planner.entity_for(JoinPath(join_path.hops[:split], join_path.attribute))
+            exists_hops = []
+            for index in range(split, len(join_path.hops)):
+                hop = planner.exists_hop(join_path, index, entity)
+                exists_hops.append(hop)
+                entity = hop.entity
+            column = getattr(entity, join_path.attribute)
+        catalog = get_model_catalog(join_path.hops[-1][1])
+    else:
+        key = node.attribute
+        column = catalog.attributes[node.attribute]
+        if planner.entity is not model:
+            column = getattr(planner.entity, node.attribute)
+
+    kind = JSON_DOCUMENT if node.attribute in catalog.json_columns else SCALAR_COLUMN
+    spec = get_operator(node.operator, kind, canonical)
+    if spec is None:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown operator '{node.operator}' for field '{key}'")
+    # Operators are applied to the underlying SQL column rather than the ORM
+    # attribute, which skips the attribute proxy on every bind.
+    clause_element = getattr(column, "__clause_element__", None)
+    build = _operator_leaf(f"'{key}'", clause_element() if clause_element else column, spec)
+    if exists_hops is None:
+        return build
+    anchor = node.relationships[:split + 1]
+    return _ExistsLeaf(anchor, exists_hops[0].attribute, _exists_wrapped(build, exists_hops[1:]))
+
+
+def _compile_quantified(model, node: Quantified, planner: JoinPlanner, canonical: bool):
+    """
+    `$any`/`$all`/`$none` as a correlated EXISTS through every hop of the
+    relationship path, with the nested filter compiled against the alias of
+    the last hop:
+
+        $any:  EXISTS (... WHERE <filter>)
+        $none: NOT EXISTS (... WHERE <filter>)
+        $all:  NOT EXISTS (... WHERE NOT coalesce(<filter>, false))
+
+    so related rows where the filter is NULL do not count as matching.
+    """
+    join_path = relationship_join_path(model, list(node.relationships))
+    entity = planner.entity
+    hops = []
+    for index in range(len(join_path.hops)):
+        hop = planner.exists_hop(join_path, index, entity)
+        hops.append(hop)
+        entity = hop.entity
+    related_model = join_path.hops[-1][1]
+    inner = JoinPlanner(related_model, entity)
+    root = fold(node.child, lambda child, child_steps: _compile_node(
+        related_model, child, child_steps, inner, canonical))
+    quantifier = node.operator
+
+    def build(values):
+        criterion = _bind_step(root, iter(values))
+        if quantifier == "$all":
+            if criterion is None:
+                return None  # every related row matches no condition
+            criterion = not_(func.coalesce(criterion, false()))
+        expression = _exists(hops[-1].attribute, criterion)
+        for hop in reversed(hops[:-1]):
+            expression = _exists(hop.attribute, expression)
+        return expression if quantifier == "$any" else not_(expression)
+    return build
+
+
+def _first_to_many_hop(model, join_path: JoinPath) -> Optional[int]:
+    """Index of the first hop filtered through EXISTS, or None if every hop is joined."""
+    catalog = get_model_catalog(model)
+    for index, (attr, related_model) in enumerate(join_path.hops):
+        if catalog.to_many == "exists" and catalog.relationships[attr].uselist:
+            return index
+        catalog = get_model_catalog(related_model)
+    return None
+
+
+def _exists_wrapped(build, hops: list):
+    """Nest the expression built by `build` in EXISTS (`any`/`has`) for each hop, innermost last."""
+    if not hops:
+        return build
+
+    def wrapped(operand):
+        expression = build(operand)
+        for hop in reversed(hops):
+            expression = _exists(hop.attribute, expression)
+        return expression
+    return wrapped
+
+
+def _mapped_column(entity, column) -> Any:
+    """The attribute of `entity` (a model or an alias of it) mapping `column`."""
+    return getattr(entity, inspect(entity).mapper.get_property_by_column(column).key)
+
+
+def _correlated_select(value, parent, hop: ExistsHop) -> Select:
+    """
+    SELECT `value` from the rows `hop` reaches, correlated to `parent`
+    through the relationship's column pairs; a many-to-many goes through
+    an alias of its secondary table, so a join of that table in the
+    enclosing query is not correlated by mistake.
+    """
+    prop = hop.attribute.property
+    if prop.secondary is None:
+        criteria = [_mapped_column(parent, local) == _mapped_column(hop.entity, remote)
+                    for local, remote in prop.local_remote_pairs]
+        return select(value).select_from(hop.entity).where(*criteria).correlate(parent)
+    secondary = prop.secondary.alias()
+    onclause = and_(*[_mapped_column(hop.entity, target) == secondary.c[column.key]
+                      for target, column in prop.secondary_synchronize_pairs])
+    criteria = [_mapped_column(parent, source) == secondary.c[column.key]
+                for source, column in prop.synchronize_pairs]
+    return select(value).select_from(secondary).join(hop.entity, onclause).where(*criteria).correlate(parent)
+
+
+def _exists(hop, criterion):
+    return hop.any(criterion) if hop.property.uselist else hop.has(criterion)
+
+
+class _GroupedLeaf:
+    """
+    A compiled leaf whose expression can be merged with those of sibling
+    leaves: `build(operand)` makes this leaf's part and `combine(*parts)`
+    the final expression. Adjacent leaves of an And with the same
+    `group_key` are combined once by `_group_leaf_steps`.
+    """
+
+    __slots__ = ("group_key", "build")
+
+    def __init__(self, group_key: tuple, build):
+        self.group_key = group_key
+        self.build = build
+
+    def __call__(self, operand):
+        return self.combine(self.build(operand))
+
+    def combine(self, *parts):
+        raise NotImplementedError
+
+
+class _ExistsLeaf(_GroupedLeaf):
+    """
+    A leaf that reaches through a to-many relationship: `build` makes the
+    criterion on the related rows and the leaf wraps it in a correlated
+    EXISTS on `hop`. Leaves on the same relationship share one EXISTS, so
+    they must hold for the same related row, as they did when the
+    relationship was joined.
+    """
+
+    __slots__ = ("hop",)
+
+    def __init__(self, anchor: tuple, hop, build):
+        super().__init__(("exists", anchor), build)
+        self.hop = hop
+
+    def combine(self, *criteria):
+        return _exists(self.hop, criteria[0] if len(criteria) == 1 else and_(*criteria))
+
+
+class _JsonPathLeaf(_GroupedLeaf):
+    """
+    A leaf on a path inside a JSONB column of a model using the jsonpath
+    backend: `build` returns the jsonpath condition together with the
+    regular expression for other dialects, and the conditions on one
+    column become a single `JsonPathMatch`.
+    """
+
+    __slots__ = ("column",)
+
+    def __init__(self, column_name: str, column, build):
+        super().__init__(("jsonpath", column_name), build)
+        self.column = column
+
+    def combine(self, *terms):
+        return JsonPathMatch(self.column, [condition for condition, _ in terms], [fallback for _, fallback in terms])
+
+
+def _jsonpath_term(label: str, keys: tuple, operator: str, build):
+    def term(operand):
+        fallback = build(operand)  # validates the operand
+        try:
+            return jsonpath_condition(keys, operator, operand), fallback
+        except Exception as e:
+            raise HTTPException(
+                status_code=400, detail=f"Error filtering {label}: {e}") from e
+    return term
+
+
+def _group_leaf_steps(child_steps: list) -> list:
+    """
+    Merge consecutive `_GroupedLeaf` steps of an And that share a group
+    key into one step. Only adjacent steps are merged, so leaves are still
+    reached in the order their operands are bound; `optimize_filter_tree`
+    orders the leaves of an And by JSON column and relationship path, so
+    leaves that can be merged are adjacent.
+    """
+    grouped: list = []
+    for step in child_steps:
+        previous = grouped[-1] if grouped else None
+        if (isinstance(step, _GroupedLeaf) and isinstance(previous, list)
+                and previous[0].group_key == step.group_key):
+            previous.append(step)
+        elif isinstance(step, _GroupedLeaf):
+            grouped.append([step])
+        else:
+            grouped.append(step)
+
+    steps = []
+    for step in grouped:
+        if not isinstance(step, list):
+            steps.append(step)
+        elif len(step) == 1:
+            steps.append(step[0])
+        else:
+            steps.append((step[0].combine, [leaf.build for leaf in step]))
+    return steps
+
+
+def _operator_leaf(label: str, target, spec: OperatorSpec):
+    def build(operand):
+        try:
+            return spec(target, operand)
+        except Exception as e:
             raise HTTPException(
-                status_code=400, detail=f"Invalid filter format for key '{key}': {value}")
+                status_code=400, detail=f"Error filtering {label}: {e}") from e
+    return build
+
+
+def _bind_step(root, values) -> Optional[Any]:
+    """
+    Evaluate a compiled step tree bottom-up with an explicit stack. Leaves
+    are reached left to right, which is the order `values` yields operands.
+    """
+    stack = [(root, False)]
+    results: list = []
+    while stack:
+        step, expanded = stack.pop()
+        if isinstance(step, ClauseElement):
+            results.append(step)  # a constant, e.g. `false()` for Never
+        elif not isinstance(step, tuple):
+            results.append(step(next(values)))
+        elif not expanded:
+            stack.append((step, True))
+            stack.extend((sub, False) for sub in reversed(step[1]))
+        else:
+            combine, sub_steps = step
+            count = len(sub_steps)
+            expressions = [expr for expr in results[len(results) - count:] if expr is not None] if count else []
+            if count:
+                del results[len(results) - count:]
+            results.append(combine(*expressions) if expressions else None)
+    return results[0]
+
+
+def compile_filter_tree(model, tree: Node, query: Select, canonical_binds: bool = False,
+                        planner: Optional[JoinPlanner] = None) -> Tuple[Optional[Any], Select]:
+    """
+    Compile a filter AST into a WHERE expression, adding the outer joins it
+    needs to `query`, or handing them to `planner` when one is given so the
+    caller can share them with sorting and apply them once. With
+    `canonical_binds`, operators whose SQL would otherwise grow with their
+    operand (e.g. `$isanyof`) are bound as a single parameter so every
+    request of a shape compiles the same.
+    """
+    plan = get_filter_plan(model, tree, canonical_binds)
+    if planner is None:
+        return plan.bind(tree), plan.apply(query)
+    planner.adopt(plan.joins)
+    return plan.bind(tree), query
+
 
-    return and_(*expressions) if expressions else None, query
+def parse_filters(model, filters: dict, query: Select, canonical_binds: bool = False) -> Tuple[Optional[Any], Select]:
+    tree = optimize_filter_tree(model, parse_filter_tree(model, filters))
+    return compile_filter_tree(model, tree, query, canonical_binds)
 
 
-def parse_filter_query(filters: Optional[str]) -> Optional[Dict]:
+def parse_filter_query(filters: Optional[str], decoder: Optional[FilterDecoder] = None) -> Optional[Dict]:
     if not filters:
         return None
     try:
-        parsed = json.loads(filters)
+        parsed = (decoder or FILTER_DECODER).decode(filters)
         if not isinstance(parsed, dict):
             raise ValueError("Filters must be a JSON object")
         return parsed
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
-            status_code=400, detail=f"Invalid filter JSON: {e}")
+            status_code=400, detail=f"Invalid filter JSON: {e}") from e
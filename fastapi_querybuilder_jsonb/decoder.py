@@ -0,0 +1,108 @@
+# fastapi_querybuilder_jsonb/decoder.py
+
+import json
+import re
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def default_loads() -> Callable[[str], Any]:
+    """orjson.loads when orjson is installed, otherwise the stdlib decoder."""
+    return orjson.loads if orjson is not None else json.loads
+
+
+# Quotes and backslashes are matched one at a time so the scan never
+# backtracks; string state is tracked in `check_structure` instead.
+_STRUCTURE = re.compile(r'[\[\]{},"\\]')
+
+
+class FilterDecoder:
+    """
+    Decodes the raw `filters` query parameter with size guards.
+
+    The byte length is checked first, then a single structural scan enforces
+    the nesting depth and element count and stops at the first violation,
+    so an oversized payload is rejected before any Python objects are
+    built for it. Only input that passes reaches `loads`.
+    """
+
+    __slots__ = ("loads", "max_bytes", "max_depth", "max_elements")
+
+    def __init__(
+        self,
+        loads: Optional[Callable[[str], Any]] = None,
+        max_bytes: Optional[int] = 64 * 1024,
+        max_depth: Optional[int] = 32,
+        max_elements: Optional[int] = 10_000,
+    ):
+        self.loads = loads or default_loads()
+        self.max_bytes = max_bytes
+        self.max_depth = max_depth
+        self.max_elements = max_elements
+
+    def decode(self, raw: str) -> Any:
+        self.check_size(raw)
+        if self.max_depth is not None or self.max_elements is not None:
+            self.check_structure(raw)
+        return self.loads(raw)
+
+    def check_size(self, raw: str) -> None:
+        if self.max_bytes is None:
+            return
+        # A character is 1-4 bytes in UTF-8, so only encode when it can matter.
+        too_long = len(raw) > self.max_bytes
+        if not too_long and len(raw) * 4 > self.max_bytes:
+            too_long = len(raw.encode("utf-8", "surrogatepass")) > self.max_bytes
+        if too_long:
+            raise HTTPException(
+                status_code=400, detail=f"Filter JSON exceeds {self.max_bytes} bytes")
+
+    def check_structure(self, raw: str) -> None:
+        max_depth = self.max_depth
+        max_elements = self.max_elements
+        depth = 0
+        elements = 0
+        in_string = False
+        # Offset of the first character not consumed by a backslash escape.
+        escaped_until = 0
+
+        for match in _STRUCTURE.finditer(raw):
+            position = match.start()
+            if position < escaped_until:
+                continue
+            token = match.group()
+            if in_string:
+                if token == "\\":
+                    escaped_until = position + 2
+                elif token == '"':
+                    in_string = False
+                continue
+            if token == '"':
+                in_string = True
+                continue
+            if token == "[" or token == "{":
+                depth += 1
+                elements += 1
+                if max_depth is not None and depth > max_depth:
+                    raise HTTPException(
+                        status_code=400, detail=f"Filter JSON nesting exceeds depth {max_depth}")
+            elif token == "]" or token == "}":
+                depth -= 1
+            elif token == ",":
+                elements += 1
+            else:
+                continue
+            if max_elements is not None and elements > max_elements:
+                raise HTTPException(
+                    status_code=400, detail=f"Filter JSON exceeds {max_elements} elements")
+
+
+# Used by `parse_filter_query` unless a decoder is passed; set its attributes
+# (e.g. `FILTER_DECODER.max_bytes = 16_384`) to configure decoding globally.
+FILTER_DECODER = FilterDecoder()
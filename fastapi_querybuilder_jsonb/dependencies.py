@@ -1,15 +1,104 @@
 # fastapi_querybuilder_jsonb/dependencies.py
 
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from threading import Lock
 from fastapi import Depends, Request
-from .params import QueryParams
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Mapper
+from .params import QueryParams, get_query_params
 from .builder import build_query
-from typing import Type
+from .catalog import get_model_catalog
+from typing import Optional, Set, Type
 
+BUILD_MODES = ("auto", "inline", "executor")
+
+_build_executor: Optional[ThreadPoolExecutor] = None
+_build_executor_lock = Lock()
+
+_pending_catalogs: Set[Type] = set()
+_pending_catalogs_lock = Lock()
+
+
+def _prepare_catalog(model: Type) -> None:
+    # Introspect the model up front so requests only do lookups. Configuring
+    # the mappers here could run before a relationship target is declared and
+    # leave the mapper registry broken, so a model that is not configured yet
+    # gets its catalog as soon as SQLAlchemy configures it.
+    if inspect(model).configured:
+        get_model_catalog(model)
+        return
+    with _pending_catalogs_lock:
+        _pending_catalogs.add(model)
+
+
+@event.listens_for(Mapper, "after_configured")
+def _build_pending_catalogs() -> None:
+    with _pending_catalogs_lock:
+        models = [model for model in _pending_catalogs if inspect(model).configured]
+        _pending_catalogs.difference_update(models)
+    for model in models:
+        get_model_catalog(model)
+
+
+def QueryBuilder(model: Type, canonical_binds: bool = False):
+    _prepare_catalog(model)
 
-def QueryBuilder(model: Type):
     def wrapper(
         request: Request,
         params: QueryParams = Depends()
     ):
-        return build_query(model, params)
+        return build_query(model, params, canonical_binds=canonical_binds)
+    return Depends(wrapper)
+
+
+def estimate_filter_complexity(filters: Optional[str]) -> int:
+    """Cheap predicate count for a raw filter string: the number of `"$...` operator keys."""
+    return filters.count('"$') if filters else 0
+
+
+def get_build_executor() -> ThreadPoolExecutor:
+    """The shared executor `AsyncQueryBuilder` offloads expensive builds to, created on first use."""
+    global _build_executor
+    if _build_executor is None:
+        with _build_executor_lock:
+            if _build_executor is None:
+                _build_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="querybuilder")
+    return _build_executor
+
+
+def AsyncQueryBuilder(
+    model: Type,
+    mode: str = "auto",
+    complexity_threshold: int = 200,
+    executor: Optional[Executor] = None,
+    canonical_binds: bool = False,
+):
+    """
+    Async variant of `QueryBuilder`. Neither the dependency nor its query
+    parameters go through FastAPI's threadpool.
+
+    mode:
+        "inline"   - always build on the event loop
+        "executor" - always build on `executor` (default: `get_build_executor()`)
+        "auto"     - build inline unless the filter has more than
+                     `complexity_threshold` operators, then offload
+    """
+    if mode not in BUILD_MODES:
+        raise ValueError(f"mode must be one of {BUILD_MODES}, got {mode!r}")
+    _prepare_catalog(model)
+
+    async def wrapper(
+        request: Request,
+        params: QueryParams = Depends(get_query_params)
+    ):
+        offload = mode == "executor" or (
+            mode == "auto" and estimate_filter_complexity(params.filters) > complexity_threshold)
+        if not offload:
+            return build_query(model, params, canonical_binds=canonical_binds)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor or get_build_executor(),
+            partial(build_query, model, params, canonical_binds=canonical_binds))
     return Depends(wrapper)
@@ -0,0 +1,211 @@
+# fastapi_querybuilder_jsonb/generated.py
+
+import json
+from typing import Any, List, Tuple
+
+from sqlalchemy import Column, Computed, Index, Integer, String, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Mapper, mapped_column
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from .jsonpath import supports_jsonpath
+
+# Column `info` key marking a generated column as a copy of a JSON path, as
+# `(json column name, path keys)`. Filters and sorts on that path are
+# rewritten to the column.
+PROMOTED_JSON_PATH = "promoted_json_path"
+
+
+class JsonPathExtract(ColumnElement):
+    """
+    The value at a path inside a JSON column, as the expression of a
+    generated column. Rendered per dialect with the path inlined, since
+    DDL cannot take bound parameters, and cast to `type_` unless it is a
+    string.
+
+    `column_name` starts out as the attribute key of the JSON column and
+    is replaced by its SQL name once the model is mapped, since the two
+    differ with `mapped_column("name", ...)`.
+    """
+
+    inherit_cache = True
+
+    _traverse_internals = [
+        ("column_name", InternalTraversal.dp_string),
+        ("keys", InternalTraversal.dp_string_list),
+        ("type", InternalTraversal.dp_type),
+    ]
+
+    def __init__(self, column_name: str, keys: Tuple[str, ...], type_: Any):
+        self.column_name = column_name
+        self.keys = tuple(keys)
+        self.type = type_
+
+
+@event.listens_for(Mapper, "after_mapper_constructed")
+def _resolve_json_column_names(mapper: Mapper, class_: Any) -> None:
+    for column in mapper.columns:
+        promoted = column.info.get(PROMOTED_JSON_PATH)
+        if promoted is not None and column.computed is not None and promoted[0] in mapper.columns:
+            column.computed.sqltext.column_name = mapper.columns[promoted[0]].name
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _cast(element: JsonPathExtract, compiler, expression: str) -> str:
+    if isinstance(element.type, String):
+        return expression
+    return f"CAST({expression} AS {compiler.dialect.type_compiler_instance.process(element.type)})"
+
+
+def _json_path(keys: Tuple[str, ...]) -> str:
+    return "$" + "".join(f".{json.dumps(key)}" for key in keys)
+
+
+@compiles(JsonPathExtract)
+def _compile_json_extract(element, compiler, **kw):
+    column = compiler.preparer.quote(element.column_name)
+    return _cast(element, compiler, f"json_extract({column}, {_literal(_json_path(element.keys))})")
+
+
+@compiles(JsonPathExtract, "mysql")
+def _compile_json_extract_mysql(element, compiler, **kw):
+    column = compiler.preparer.quote(element.column_name)
+    return _cast(element, compiler, f"json_unquote(json_extract({column}, {_literal(_json_path(element.keys))}))")
+
+
+def _pg_path(column: str, keys: Tuple[str, ...], text: bool) -> str:
+    # (attributes ->> 'city') / (attributes #>> '{"stats","score"}'), or -> / #> for the JSON value
+    if len(keys) == 1:
+        return f"({column} {'->>' if text else '->'} {_literal(keys[0])})"
+    path = "{" + ",".join(json.dumps(key) for key in keys) + "}"
+    return f"({column} {'#>>' if text else '#>'} {_literal(path)})"
+
+
+@compiles(JsonPathExtract, "postgresql")
+def _compile_json_extract_postgresql(element, compiler, **kw):
+    column = compiler.preparer.quote(element.column_name)
+    return _cast(element, compiler, _pg_path(column, element.keys, text=True))
+
+
+class JsonArrayLength(ColumnElement):
+    """
+    The length of the JSON array at `keys` inside `column`, NULL when the
+    value is missing or not an array. The path is rendered inline rather
+    than bound, so the expression is the same in a query and in an index:
+
+        (CASE WHEN jsonb_typeof((attributes -> 'items')) = 'array'
+              THEN jsonb_array_length((attributes -> 'items')) END)
+    """
+
+    inherit_cache = True
+    type = Integer()
+
+    _traverse_internals = [
+        ("column", InternalTraversal.dp_clauseelement),
+        ("keys", InternalTraversal.dp_string_list),
+    ]
+
+    def __init__(self, column: Any, keys: Tuple[str, ...]):
+        self.column = column.expression
+        self.keys = tuple(keys)
+
+
+@compiles(JsonArrayLength)
+def _compile_json_array_length(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    path = _literal(_json_path(element.keys))
+    return (f"(CASE WHEN json_type({column}, {path}) = 'array' "
+            f"THEN json_array_length({column}, {path}) END)")
+
+
+@compiles(JsonArrayLength, "mysql")
+def _compile_json_array_length_mysql(element, compiler, **kw):
+    value = f"json_extract({compiler.process(element.column, **kw)}, {_literal(_json_path(element.keys))})"
+    return f"(CASE WHEN json_type({value}) = 'ARRAY' THEN json_length({value}) END)"
+
+
+@compiles(JsonArrayLength, "postgresql")
+def _compile_json_array_length_postgresql(element, compiler, **kw):
+    prefix = "jsonb" if supports_jsonpath(element.column) else "json"
+    value = _pg_path(compiler.process(element.column, **kw), element.keys, text=False)
+    return f"(CASE WHEN {prefix}_typeof({value}) = 'array' THEN {prefix}_array_length({value}) END)"
+
+
+def json_array_length_index(name: str, column: Any, path: str, **kwargs) -> Index:
+    """
+    An index on the length of the array at `path` inside `column`, matching
+    the `$size` filters on that path:
+
+        json_array_length_index("ix_users_items_length", User.attributes, "items")
+
+    Declare it after the model class; keyword arguments go to `Index`.
+    """
+    return Index(name, JsonArrayLength(column, tuple(path.split("."))), **kwargs)
+
+
+def json_path_column(path: str, type_: Any = String, *, persisted: bool = True, **kwargs) -> Any:
+    """
+    Declare a generated column holding the value at `path` ("column.key...")
+    of a JSON/JSONB column of the same model. Filters and sorts on `path`
+    then use this column, and its B-tree index if declared with
+    `index=True`, instead of extracting the value from every document:
+
+        class User(Base):
+            attributes: Mapped[dict] = mapped_column(JSONB)
+            city: Mapped[str] = json_path_column("attributes.city", index=True)
+            score: Mapped[float] = json_path_column("attributes.score", Numeric, index=True)
+
+    `persisted` is passed to `Computed`. The column is STORED by default,
+    which PostgreSQL requires to index it (before PostgreSQL 18 it has no
+    virtual columns at all); `persisted=False` makes it VIRTUAL on SQLite
+    and MySQL. Further keyword arguments go to `mapped_column`. On
+    PostgreSQL the expression must be immutable, so prefer text and
+    numeric types to timestamps.
+    """
+    column_name, *keys = path.split(".")
+    if not keys:
+        raise ValueError(f"Expected '<json column>.<key>[.<key>...]', got {path!r}")
+    if isinstance(type_, type):
+        type_ = type_()
+    info = dict(kwargs.pop("info", None) or {})
+    info[PROMOTED_JSON_PATH] = (column_name, tuple(keys))
+    # Documents without the path give NULL, whatever the Mapped[] annotation says
+    kwargs.setdefault("nullable", True)
+    return mapped_column(type_, Computed(JsonPathExtract(column_name, tuple(keys), type_), persisted=persisted),
+                         info=info, **kwargs)
+
+
+def json_path_column_ddl(attribute: Any, dialect: Any) -> List[str]:
+    """
+    Statements adding a column declared with `json_path_column` to an
+    existing table, and creating its indexes, for use in a migration:
+
+        for statement in json_path_column_ddl(User.city, op.get_bind().dialect):
+            op.execute(statement)
+
+    SQLite can only add virtual generated columns, so the column is added
+    as VIRTUAL there even if declared `persisted=True`.
+    """
+    column = getattr(attribute, "expression", attribute)
+    table = column.table
+    added = column
+    if dialect.name == "sqlite" and column.computed is not None and column.computed.persisted:
+        added = Column(column.name, column.type, Computed(column.computed.sqltext, persisted=False))
+    statements = [f"ALTER TABLE {dialect.identifier_preparer.format_table(table)} "
+                  f"ADD COLUMN {CreateColumn(added).compile(dialect=dialect)}"]
+    for index in sorted(table.indexes, key=lambda index: index.name or ""):
+        if any(indexed is column or indexed.name == column.name for indexed in index.columns):
+            statements.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return statements
+
+
+def add_json_path_column(connection: Any, attribute: Any) -> None:
+    """Run `json_path_column_ddl` on `connection` (sync)."""
+    from sqlalchemy import text
+    for statement in json_path_column_ddl(attribute, connection.dialect):
+        connection.execute(text(statement))
@@ -0,0 +1,357 @@
+# fastapi_querybuilder_jsonb/jsonpath.py
+
+import json
+from typing import Any, List, Sequence, Tuple
+
+from sqlalchemy import Boolean, DateTime, Numeric, String, Text, and_, case, cast, column as sql_column, exists, \
+    func, literal, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import JSON, JSONB, JSONPATH
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+# Comparison operators for jsonpath predicates. Comparisons are typed: a
+# number only matches numbers and a string only strings, unlike the text
+# comparison used by the default backend.
+JSONPATH_COMPARISONS = {
+    "$eq": "==",
+    "$ne": "!=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+
+# Filter operators the jsonpath backend can express
+JSONPATH_OPERATORS = frozenset((*JSONPATH_COMPARISONS, "$in"))
+
+
+def supports_jsonpath(column) -> bool:
+    """Whether `column` is JSONB on PostgreSQL (JSONB, or JSON with a JSONB variant)."""
+    column_type = column.type
+    if isinstance(column_type, JSONB):
+        return True
+    variants = getattr(column_type, "_variant_mapping", None) or {}
+    return isinstance(variants.get("postgresql"), JSONB)
+
+
+def jsonpath_accessor(keys: Sequence[str], root: str = "$") -> str:
+    # ("address", "city") -> $."address"."city"
+    return root + "".join(f".{json.dumps(key)}" for key in keys)
+
+
+def jsonpath_condition(keys: Tuple[str, ...], operator: str, value: Any, root: str = "$") -> str:
+    """
+    One jsonpath predicate, e.g. `$."score" >= 80`, for a filter operator
+    and operand; `root="@"` makes it a filter on the current item instead.
+    """
+    accessor = jsonpath_accessor(keys, root)
+    if operator == "$in":
+        if not value:
+            return "false"
+        return "(" + " || ".join(f"{accessor} == {_literal(v)}" for v in value) + ")"
+    if operator == "$ne":
+        # `!=` is unknown between JSON types (5 != "5"); keep `$ne` the
+        # complement of `$eq` among items that have the key.
+        return f"(exists({accessor}) && !({accessor} == {_literal(value)}))"
+    return f"{accessor} {JSONPATH_COMPARISONS[operator]} {_literal(value)}"
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        raise TypeError(f"expected a scalar value, got {type(value).__name__}")
+    # JSON literals are valid jsonpath literals (strings, numbers, true/false/null).
+    return json.dumps(value)
+
+
+class JsonPathMatch(ColumnElement):
+    """
+    The conditions on one JSONB column as a single `column @@ jsonpath`
+    predicate, which one GIN index lookup can serve and which reads the
+    document once per row. On dialects other than PostgreSQL it compiles
+    to `fallback`, the same conditions built with the regular operators.
+    """
+
+    inherit_cache = True
+    type = Boolean()
+    # A predicate, so no "= 1" is added on backends without a boolean type
+    _is_implicitly_boolean = True
+
+    _traverse_internals = [
+        ("predicate", InternalTraversal.dp_clauseelement),
+        ("fallback", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, column, conditions: Sequence[str], fallbacks: Sequence[Any]):
+        path = " && ".join(conditions)
+        # Bound as one parameter, so the SQL is the same whatever the operands.
+        self.predicate = column.op("@@", return_type=Boolean)(cast(path, JSONPATH))
+        self.fallback = fallbacks[0] if len(fallbacks) == 1 else and_(*fallbacks)
+
+
+# One `$elemMatch` condition: (field keys, operator, operand); empty keys
+# compare the array element itself.
+ElemCondition = Tuple[Tuple[str, ...], str, Any]
+
+
+def elem_match_conditions(value: Any) -> List[ElemCondition]:
+    """
+    Normalize an `$elemMatch` operand. Keys starting with `$` compare the
+    elements themselves (`{"$gte": 2}`); other keys are (dotted) fields of
+    object elements, with a condition object or a value to match
+    (`{"name": "a", "weight": {"$gte": 2}}`).
+    """
+    if not isinstance(value, dict) or not value:
+        raise TypeError("expected a non-empty object of conditions")
+    conditions = []
+    for key, condition in value.items():
+        if key.startswith("$"):
+            keys, condition = (), {key: condition}
+        else:
+            keys = tuple(key.split("."))
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator not in JSONPATH_OPERATORS:
+                raise ValueError(f"Unsupported operator {operator!r} in $elemMatch")
+            for v in operand if operator == "$in" and isinstance(operand, list) else (operand,):
+                _literal(v)
+            if operator == "$in" and not isinstance(operand, list):
+                raise TypeError(f"expected a list, got {type(operand).__name__}")
+            conditions.append((keys, operator, operand))
+    # Same conditions in any order give the same SQL
+    return sorted(conditions, key=lambda condition: condition[:2])
+
+
+def _compare(expression, operator: str, value: Any):
+    if operator == "$in":
+        return or_(*[_compare(expression, "$eq", v) for v in value]) if value else literal(False)
+    if value is None:
+        return expression.is_(None) if operator == "$eq" else expression.is_not(None)
+    return {
+        "$eq": expression.__eq__,
+        "$ne": expression.__ne__,
+        "$gt": expression.__gt__,
+        "$gte": expression.__ge__,
+        "$lt": expression.__lt__,
+        "$lte": expression.__le__,
+    }[operator](value)
+
+
+def _typed(text, value: Any):
+    # Text of a JSON value compared as the operand's type
+    sample = value[0] if isinstance(value, list) and value else value
+    if isinstance(sample, bool):
+        return cast(text, Boolean)
+    if isinstance(sample, (int, float)):
+        return cast(text, Numeric)
+    return text
+
+
+def _array_elements_exists(array, conditions: Sequence[ElemCondition]):
+    # PostgreSQL JSON: EXISTS (SELECT 1 FROM json_array_elements(array) AS elem WHERE ...)
+    elements = func.json_array_elements(array).table_valued(sql_column("value", JSON)).alias("elem")
+    clauses = []
+    for keys, operator, value in conditions:
+        if keys:
+            text = elements.c.value[keys if len(keys) > 1 else keys[0]].astext
+        else:
+            text = elements.c.value.op("#>>", return_type=Text)(literal_column("'{}'"))
+        clauses.append(_compare(_typed(text, value), operator, value))
+    return exists(select(literal_column("1")).select_from(elements).where(*clauses))
+
+
+def _json_each_exists(column, keys: Sequence[str], conditions: Sequence[ElemCondition]):
+    # SQLite: EXISTS (SELECT 1 FROM json_each(column, '$."tags"') AS elem WHERE ...).
+    # json_extract returns SQL numbers and strings, so no cast is needed.
+    elements = func.json_each(column, jsonpath_accessor(keys)).table_valued("value").alias("elem")
+    clauses = [
+        _compare(func.json_extract(elements.c.value, jsonpath_accessor(field)) if field else elements.c.value,
+                 operator, value)
+        for field, operator, value in conditions
+    ]
+    return exists(select(literal_column("1")).select_from(elements).where(*clauses))
+
+
+class JsonElemMatch(ColumnElement):
+    """
+    Whether some element of the JSON array at `keys` inside `column`
+    satisfies every condition. JSONB on PostgreSQL gets one `@?` jsonpath
+    predicate, `$."tags"[*] ? (@."weight" >= 2)`, which a GIN index can
+    serve; JSON on PostgreSQL an EXISTS over `json_array_elements`, and
+    other dialects an EXISTS over `json_each`.
+    """
+
+    inherit_cache = True
+    type = Boolean()
+    _is_implicitly_boolean = True
+
+    _traverse_internals = [
+        ("predicate", InternalTraversal.dp_clauseelement),
+        ("fallback", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, column, keys: Tuple[str, ...], element, conditions: Sequence[ElemCondition]):
+        if supports_jsonpath(column):
+            path = "{}[*] ? ({})".format(
+                jsonpath_accessor(keys),
+                " && ".join(jsonpath_condition(field, operator, value, "@") for field, operator, value in conditions))
+            self.predicate = column.op("@?", return_type=Boolean)(cast(path, JSONPATH))
+        else:
+            self.predicate = _array_elements_exists(element, conditions)
+        self.fallback = _json_each_exists(column, keys, conditions)
+
+
+@compiles(JsonElemMatch)
+def _compile_elem_match_fallback(element, compiler, **kw):
+    return compiler.process(element.fallback, **kw)
+
+
+@compiles(JsonElemMatch, "postgresql")
+def _compile_elem_match(element, compiler, **kw):
+    return compiler.process(element.predicate, **kw)
+
+
+@compiles(JsonPathMatch)
+def _compile_fallback(element, compiler, **kw):
+    return compiler.process(element.fallback.self_group(), **kw)
+
+
+@compiles(JsonPathMatch, "postgresql")
+def _compile_jsonpath(element, compiler, **kw):
+    return compiler.process(element.predicate, **kw)
+
+
+class JsonbVariantPredicate(ColumnElement):
+    """
+    A predicate on a JSON column with a JSONB variant: `predicate`, built
+    with the JSONB operators (containment, key existence), on PostgreSQL
+    and `fallback`, built with the JSON ones, on other dialects.
+    """
+
+    inherit_cache = True
+    type = Boolean()
+    _is_implicitly_boolean = True
+
+    _traverse_internals = [
+        ("predicate", InternalTraversal.dp_clauseelement),
+        ("fallback", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, predicate, fallback):
+        self.predicate = predicate
+        self.fallback = fallback
+
+
+@compiles(JsonbVariantPredicate)
+def _compile_variant_fallback(element, compiler, **kw):
+    return compiler.process(element.fallback.self_group(), **kw)
+
+
+@compiles(JsonbVariantPredicate, "postgresql")
+def _compile_variant_jsonb(element, compiler, **kw):
+    return compiler.process(element.predicate.self_group(), **kw)
+
+
+class JsonTypeOf(ColumnElement):
+    """
+    The JSON type name of the value at `keys` inside `column` ("null" for an
+    explicit JSON null), or NULL when the path is missing, so the two can be
+    told apart on every dialect: `jsonb_typeof`/`json_typeof` on PostgreSQL,
+    `json_type` on SQLite and MySQL.
+    """
+
+    inherit_cache = True
+    type = String()
+
+    _traverse_internals = [
+        ("column", InternalTraversal.dp_clauseelement),
+        ("element", InternalTraversal.dp_clauseelement),
+        ("path", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, column, keys: Sequence[str], element):
+        self.column = column
+        # `element` is the path expression (-> / #>) used on PostgreSQL
+        self.element = element
+        self.path = literal(jsonpath_accessor(keys), String)
+
+
+@compiles(JsonTypeOf)
+def _compile_json_type(element, compiler, **kw):
+    return compiler.process(func.json_type(element.column, element.path), **kw)
+
+
+@compiles(JsonTypeOf, "mysql")
+def _compile_json_type_mysql(element, compiler, **kw):
+    # MySQL names types in upper case ("NULL", "INTEGER")
+    return compiler.process(func.lower(func.json_type(func.json_extract(element.column, element.path))), **kw)
+
+
+@compiles(JsonTypeOf, "postgresql")
+def _compile_json_typeof(element, compiler, **kw):
+    typeof = func.jsonb_typeof if supports_jsonpath(element.column) else func.json_typeof
+    return compiler.process(typeof(element.element), **kw)
+
+
+# The text PostgreSQL accepts as input for NUMERIC and BOOLEAN, so a guarded
+# cast skips exactly the values the plain cast would fail on.
+_CAST_INPUT_PATTERNS = (
+    (Numeric, r"^\s*[+-]?((\d+\.?\d*|\.\d+)(e[+-]?\d+)?|nan|inf|infinity)\s*$"),
+    (Boolean, r"^\s*(t|tr|tru|true|y|ye|yes|on|1|f|fa|fal|fals|false|n|no|of|off|0)\s*$"),
+)
+
+
+class JsonPathCast(ColumnElement):
+    """
+    The value at `keys` inside `column` cast to `type_`, where `text` is
+    the path's text expression (`attributes ->> 'score'`).
+
+    On PostgreSQL this is `CAST(text AS type)`, the expression an index on
+    the path is built from. `guarded` wraps it in a CASE that leaves values
+    the cast cannot take NULL rather than failing the query. SQLite reads
+    the unquoted value with `json_extract` and compares datetimes in the
+    text format SQLAlchemy stores them in.
+    """
+
+    inherit_cache = True
+
+    _traverse_internals = [
+        ("text", InternalTraversal.dp_clauseelement),
+        ("column", InternalTraversal.dp_clauseelement),
+        ("path", InternalTraversal.dp_clauseelement),
+        ("type", InternalTraversal.dp_type),
+        ("guarded", InternalTraversal.dp_boolean),
+    ]
+
+    def __init__(self, text, column, keys: Sequence[str], type_: Any, guarded: bool = False):
+        self.text = text
+        self.column = column
+        self.path = literal(jsonpath_accessor(keys), String)
+        self.type = type_
+        self.guarded = guarded
+
+
+@compiles(JsonPathCast)
+def _compile_json_path_cast(element, compiler, **kw):
+    return compiler.process(cast(element.text, element.type), **kw)
+
+
+@compiles(JsonPathCast, "sqlite")
+def _compile_json_path_cast_sqlite(element, compiler, **kw):
+    value = func.json_extract(element.column, element.path)
+    if isinstance(element.type, DateTime):
+        # "YYYY-MM-DD HH:MM:SS.SSS" plus the microsecond digits SQLite lacks
+        return compiler.process(func.strftime("%Y-%m-%d %H:%M:%f", value).concat("000"), **kw)
+    return compiler.process(cast(value, element.type), **kw)
+
+
+@compiles(JsonPathCast, "postgresql")
+def _compile_json_path_cast_postgresql(element, compiler, **kw):
+    expression = cast(element.text, element.type)
+    if element.guarded:
+        for sql_type, pattern in _CAST_INPUT_PATTERNS:
+            if isinstance(element.type, sql_type):
+                expression = case((element.text.regexp_match(pattern, flags="i"), expression))
+                break
+    return compiler.process(expression, **kw)
@@ -0,0 +1,316 @@
+# fastapi_querybuilder_jsonb/nodes.py
+
+import hashlib
+import json
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+
+def _freeze(value: Any) -> Any:
+    """Hashable, type-tagged copy of a JSON operand (so 1, 1.0 and True differ)."""
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(_freeze(v) for v in value))
+    return (type(value).__name__, value)
+
+
+def fold(root: "Node", combine: Callable[["Node", List[Any]], Any]) -> Any:
+    """
+    Evaluate `combine(node, child_results)` bottom-up over the tree rooted
+    at `root`, children left to right, using an explicit stack so arbitrarily
+    deep trees never hit the recursion limit.
+    """
+    stack = [(root, False)]
+    results: List[Any] = []
+    while stack:
+        node, expanded = stack.pop()
+        children = node.children_nodes()
+        if expanded or not children:
+            count = len(children)
+            child_results = results[len(results) - count:] if count else []
+            if count:
+                del results[len(results) - count:]
+            results.append(combine(node, child_results))
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+    return results[0]
+
+
+class Node:
+    """
+    Base class of the filter AST. Nodes are immutable and compare and hash
+    structurally, operands included.
+
+    `shape()` is the structure without operands (what a compiled plan is
+    keyed on) and `iter_values()` yields the operands in the order a plan
+    consumes them. Both walk the tree without recursion.
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def children_nodes(self) -> Tuple["Node", ...]:
+        return ()
+
+    def shape(self) -> tuple:
+        return fold(self, lambda node, child_shapes: node._shape(child_shapes))
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        raise NotImplementedError
+
+    def iter_values(self) -> Iterator[Any]:
+        stack: List[Node] = [self]
+        while stack:
+            node = stack.pop()
+            children = node.children_nodes()
+            if children:
+                stack.extend(reversed(children))
+            elif isinstance(node, _Leaf):
+                yield node.value
+
+    def _key(self) -> tuple:
+        return (self.shape(), _freeze(list(self.iter_values())))
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def fingerprint(self, with_values: bool = False) -> str:
+        """Hex digest of the shape (and optionally the operands), stable across processes."""
+        payload: Any = self.shape()
+        if with_values:
+            payload = [payload, list(self.iter_values())]
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class _Group(Node):
+    __slots__ = ("children",)
+
+    tag = ""
+
+    children: Tuple[Node, ...]
+
+    def __init__(self, children):
+        object.__setattr__(self, "children", tuple(children))
+
+    @classmethod
+    def of(cls, children) -> Node:
+        """
+        Build a group, splicing in children of the same type (And inside And,
+        Or inside Or) and returning a lone child as-is, so associative runs
+        become one flat n-ary node instead of a deep chain.
+        """
+        flat: List[Node] = []
+        for child in children:
+            if type(child) is cls:
+                flat.extend(child.children)
+            else:
+                flat.append(child)
+        if len(flat) == 1:
+            return flat[0]
+        return cls(flat)
+
+    def children_nodes(self) -> Tuple[Node, ...]:
+        return self.children
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        return (self.tag, tuple(child_shapes))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self.children)!r})"
+
+
+class And(_Group):
+    __slots__ = ()
+    tag = "and"
+
+
+class Or(_Group):
+    __slots__ = ()
+    tag = "or"
+
+
+class Not(Node):
+    __slots__ = ("child",)
+
+    child: Node
+
+    def __init__(self, child: Node):
+        object.__setattr__(self, "child", child)
+
+    def children_nodes(self) -> Tuple[Node, ...]:
+        return (self.child,)
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        return ("not", child_shapes[0])
+
+    def __repr__(self) -> str:
+        return f"Not({self.child!r})"
+
+
+class Never(Node):
+    """A filter no row can satisfy, e.g. `{"age": {"$gt": 40, "$lt": 30}}` once simplified."""
+
+    __slots__ = ()
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        return ("never",)
+
+    def __repr__(self) -> str:
+        return "Never()"
+
+
+class _Leaf(Node):
+    __slots__ = ("operator", "value")
+
+    operator: str
+    value: Any
+
+    @property
+    def target(self) -> tuple:
+        """What the leaf compares, i.e. its shape without the operator."""
+        return self._shape([])[:-1]
+
+    def with_operand(self, operator: str, value: Any) -> "_Leaf":
+        """A copy of this leaf on the same target with another operator and value."""
+        leaf = object.__new__(type(self))
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                object.__setattr__(leaf, slot, getattr(self, slot))
+        object.__setattr__(leaf, "operator", operator)
+        object.__setattr__(leaf, "value", value)
+        return leaf
+
+
+class Compare(_Leaf):
+    """`attribute <operator> value` on the filtered model itself."""
+
+    __slots__ = ("attribute",)
+
+    attribute: str
+
+    def __init__(self, attribute: str, operator: str, value: Any):
+        object.__setattr__(self, "attribute", attribute)
+        object.__setattr__(self, "operator", operator)
+        object.__setattr__(self, "value", value)
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        return ("cmp", self.attribute, self.operator)
+
+    def __repr__(self) -> str:
+        return f"Compare({self.attribute!r}, {self.operator!r}, {self.value!r})"
+
+
+class JsonPathCompare(_Leaf):
+    """A comparison on a value inside a JSON/JSONB column (`attributes.hair`)."""
+
+    __slots__ = ("column", "path")
+
+    column: str
+    path: Tuple[str, ...]
+
+    def __init__(self, column: str, path: Tuple[str, ...], operator: str, value: Any):
+        object.__setattr__(self, "column", column)
+        object.__setattr__(self, "path", tuple(path))
+        object.__setattr__(self, "operator", operator)
+        object.__setattr__(self, "value", value)
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        return ("json", self.column, self.path, self.operator)
+
+    def __repr__(self) -> str:
+        return f"JsonPathCompare({self.column!r}, {self.path!r}, {self.operator!r}, {self.value!r})"
+
+
+class RelationshipCompare(_Leaf):
+    """A comparison on an attribute reached through relationships (`role.department.name`)."""
+
+    __slots__ = ("relationships", "attribute")
+
+    relationships: Tuple[str, ...]
+    attribute: str
+
+    def __init__(self, relationships: Tuple[str, ...], attribute: str, operator: str, value: Any):
+        object.__setattr__(self, "relationships", tuple(relationships))
+        object.__setattr__(self, "attribute", attribute)
+        object.__setattr__(self, "operator", operator)
+        object.__setattr__(self, "value", value)
+
+    @property
+    def key(self) -> str:
+        return ".".join((*self.relationships, self.attribute))
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        return ("rel", self.relationships, self.attribute, self.operator)
+
+    def __repr__(self) -> str:
+        return (f"RelationshipCompare({self.relationships!r}, {self.attribute!r}, "
+                f"{self.operator!r}, {self.value!r})")
+
+
+class Quantified(_Leaf):
+    """
+    `$any`/`$all`/`$none` of a nested filter (`child`, over the related
+    model) on the rows reached through `relationships`. Its operands are
+    those of `child`, so it is bound like any other leaf.
+    """
+
+    __slots__ = ("relationships", "child")
+
+    relationships: Tuple[str, ...]
+    child: Node
+
+    def __init__(self, relationships: Tuple[str, ...], operator: str, child: Node):
+        object.__setattr__(self, "relationships", tuple(relationships))
+        object.__setattr__(self, "child", child)
+        object.__setattr__(self, "operator", operator)
+        object.__setattr__(self, "value", tuple(child.iter_values()))
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        # The nested shape is part of the target, so different nested
+        # filters with equal operands never look like duplicates.
+        return ("quant", self.relationships, self.child.shape(), self.operator)
+
+    def __repr__(self) -> str:
+        return f"Quantified({self.relationships!r}, {self.operator!r}, {self.child!r})"
+
+
+class Aggregate(_Leaf):
+    """
+    `<aggregate>(attribute) <operator> value` over the rows reached through
+    `relationships` (`$count` of the rows themselves when `attribute` is None).
+    """
+
+    __slots__ = ("relationships", "attribute", "aggregate")
+
+    relationships: Tuple[str, ...]
+    attribute: Optional[str]
+    aggregate: str
+
+    def __init__(self, relationships: Tuple[str, ...], attribute: Optional[str], aggregate: str,
+                 operator: str, value: Any):
+        object.__setattr__(self, "relationships", tuple(relationships))
+        object.__setattr__(self, "attribute", attribute)
+        object.__setattr__(self, "aggregate", aggregate)
+        object.__setattr__(self, "operator", operator)
+        object.__setattr__(self, "value", value)
+
+    @property
+    def key(self) -> str:
+        return ".".join((*self.relationships, self.attribute) if self.attribute else self.relationships)
+
+    def _shape(self, child_shapes: List[tuple]) -> tuple:
+        return ("agg", self.relationships, self.attribute, self.aggregate, self.operator)
+
+    def __repr__(self) -> str:
+        return (f"Aggregate({self.relationships!r}, {self.attribute!r}, {self.aggregate!r}, "
+                f"{self.operator!r}, {self.value!r})")
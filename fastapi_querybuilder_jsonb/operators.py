@@ -1,13 +1,54 @@
 # app/filters/operators.py
 
-from sqlalchemy import and_, or_, JSON, cast, Integer, DateTime
+import json
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from sqlalchemy import and_, or_, not_, false, func, JSON, cast, type_coerce, Boolean, Integer, DateTime, Numeric, String
+from sqlalchemy.types import TypeEngine
 from sqlalchemy.sql import operators
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
+from .generated import JsonArrayLength
+from .jsonpath import (
+    JsonbVariantPredicate,
+    JsonPathCast,
+    JsonElemMatch,
+    JsonTypeOf,
+    elem_match_conditions,
+    jsonpath_accessor,
+    supports_jsonpath,
+)
+from .nodes import And, Not, Or
+from .sampler import JSON_TYPE_MAP
 from .utils import _adjust_date_range
 
 LOGICAL_OPERATORS = {
     "$and": and_,
-    "$or": or_
+    "$or": or_,
+    "$not": lambda *clauses: not_(and_(*clauses)),
+    "$nor": lambda *clauses: not_(or_(*clauses)),
+}
+
+# Filter AST node built from the children of each logical operator. `$not`
+# takes one filter object, the others a list of them.
+LOGICAL_NODES = {
+    "$and": And.of,
+    "$or": Or.of,
+    "$not": lambda children: Not(And.of(children)),
+    "$nor": lambda children: Not(Or.of(children)),
+}
+
+# Operators on a relationship key that take a filter on the related rows:
+# some, every, or no related row matches it.
+QUANTIFIERS = ("$any", "$all", "$none")
+
+# Aggregates over the rows reached through a relationship path, compared
+# with the scalar operators: {"users": {"$count": {"$gt": 100}}} or
+# {"orders.total": {"$max": {"$gte": 500}}}. Sorts take them as a last key
+# (`sort=users.$count:desc`).
+AGGREGATES = {
+    "$count": func.count,
+    "$min": func.min,
+    "$max": func.max,
+    "$sum": func.sum,
 }
 
 
@@ -44,6 +85,16 @@ def _lt_operator(column, value):
 def _lte_operator(column, value):
     return operators.le(column, _adjust_date_range(column, value, "$lte")[0])
 
+_JSON_PATH_OPS = {
+    "==": operators.eq,
+    "!=": operators.ne,
+    "<":  operators.lt,
+    "<=": operators.le,
+    ">":  operators.gt,
+    ">=": operators.ge,
+    "in": operators.in_op,
+}
+
 def _json_path_filter(column, path: str, value, op: str, cast_to=None):
     expr = column
     for key in path.split("."):
@@ -55,16 +106,7 @@ def _json_path_filter(column, path: str, value, op: str, cast_to=None):
         leaf = cast(leaf, cast_to)
 
     # 3) map op string to SQLA operator
-    op_map = {
-        "==": operators.eq,
-        "!=": operators.ne,
-        "<":  operators.lt,
-        "<=": operators.le,
-        ">":  operators.gt,
-        ">=": operators.ge,
-        "in": operators.in_op,
-    }
-    fn = op_map.get(op)
+    fn = _JSON_PATH_OPS.get(op)
     if not fn:
         raise ValueError(f"Unsupported operator {op!r}")
 
@@ -80,11 +122,22 @@ def _range_operator(column, low, high, sql_type):
 
 
 def _isanyof_operator(column, value):
-    return or_(*[
-        _adjust_date_range(column, v, "$eq")[
-            0] if isinstance(v, str) else column == v
-        for v in value
-    ])
+    conditions = []
+    for v in value:
+        # A date matches its whole day; anything else, datetimes included, by equality
+        adjusted_value, is_range = _adjust_date_range(column, v, "$eq")
+        conditions.append(adjusted_value if is_range else column == adjusted_value)
+    return or_(*conditions)
+
+def _isanyof_in_operator(column, value):
+    """
+    `$isanyof` as one expanding IN, so the statement shape does not depend
+    on how many values were sent. Date columns (day-range expansion) and
+    lists containing null keep the OR form.
+    """
+    if isinstance(column.type, DateTime) or any(v is None for v in value):
+        return _isanyof_operator(column, value)
+    return column.in_(value)
 
 def _contains_operator(column, value):
     # if JSON/JSONB column, use JSONB.contains()
@@ -115,6 +168,8 @@ def _contained_by_operator(column, value):
         raise TypeError("$contained_by is only supported on JSON/JSONB columns")
     return column.contained_by(cast(value, JSONB))
 
+# Flat name -> function table for scalar columns. Kept for callers that import
+# it; the builder dispatches through OPERATOR_REGISTRY below.
 COMPARISON_OPERATORS = {
     "$eq": _eq_operator,
     "$ne": _ne_operator,
@@ -142,10 +197,477 @@ COMPARISON_OPERATORS = {
     "$dt_between" : lambda col, bounds: _range_operator(col, bounds[0], bounds[1], DateTime),
 
     "$path_eq": lambda col, v: _json_path_filter(col, list(v.items())[0][0], list(v.items())[0][1], "=="),
-    "$path_gt": lambda col, v: cast(_json_path_filter(col, v["path"], v["value"], "==").astext, Integer) > v["value"],
-    "$path_gte": lambda col, v: cast(_json_path_filter(col, v["path"], v["value"], "==").astext, Integer) >= v["value"],
-    "$path_lt": lambda col, v: cast(_json_path_filter(col, v["path"], v["value"], "==").astext, Integer) < v["value"],
-    "$path_lte": lambda col, v: cast(_json_path_filter(col, v["path"], v["value"], "==").astext, Integer) <= v["value"],
+    "$path_gt": lambda col, v: _json_path_filter(col, v["path"], v["value"], ">", Integer),
+    "$path_gte": lambda col, v: _json_path_filter(col, v["path"], v["value"], ">=", Integer),
+    "$path_lt": lambda col, v: _json_path_filter(col, v["path"], v["value"], "<", Integer),
+    "$path_lte": lambda col, v: _json_path_filter(col, v["path"], v["value"], "<=", Integer),
     "$path_in": lambda col, v: _json_path_filter(col, v["path"], v["values"], "in"),
 
-}
\ No newline at end of file
+}
+
+
+# ───── Operator registry ─────────────────────────
+#
+# Operators are looked up by (name, column kind). The kind says what the
+# builder is filtering on:
+#   SCALAR_COLUMN  - a plain mapped column (or a JSON column compared whole
+#                    with a generic operator)
+#   JSON_PATH_LEAF - a value inside a JSON/JSONB column ("attributes.hair")
+#   JSONB_PATH_LEAF - a value inside a JSONB column that may be matched by
+#                    containment (`@>`); falls back to JSON_PATH_LEAF
+#   JSON_DOCUMENT  - a JSON/JSONB column itself ("attributes": {"$has_key": ..})
+
+SCALAR_COLUMN = "scalar"
+JSON_PATH_LEAF = "json_path"
+JSONB_PATH_LEAF = "jsonb_path"
+JSON_DOCUMENT = "json_document"
+
+# Kind whose operators are used when a kind has no entry of its own
+KIND_FALLBACKS = {JSONB_PATH_LEAF: JSON_PATH_LEAF}
+
+# Column `info` key; set it to False to compare JSONB path values as text
+# (`->>`) instead of by containment, e.g.
+#   mapped_column(JSONB, info={JSONB_CONTAINMENT: False})
+JSONB_CONTAINMENT = "jsonb_containment"
+
+
+# Column `info` key mapping dotted paths to the SQL type their values are
+# compared as, matching the expression index on the path, e.g.
+#   mapped_column(JSONB, info={JSON_PATH_TYPES: {"score": Numeric, "seen_at": DateTime}})
+# compares `attributes.score` as CAST((attributes ->> 'score') AS NUMERIC).
+JSON_PATH_TYPES = "json_path_types"
+
+
+def json_path_kind(column) -> str:
+    """
+    The kind of the values inside `column`: JSONB_PATH_LEAF for JSONB (or
+    JSON with a JSONB variant) unless it opted out, otherwise JSON_PATH_LEAF.
+    """
+    if supports_jsonpath(column) and column.info.get(JSONB_CONTAINMENT, True):
+        return JSONB_PATH_LEAF
+    return JSON_PATH_LEAF
+
+
+class JsonPathLeaf:
+    """
+    A path inside a JSON/JSONB column, as handed to JSON_PATH_LEAF operators:
+    the column, the path keys, the element expression and its text value.
+    """
+
+    __slots__ = ("column", "keys", "document", "element", "text")
+
+    def __init__(self, column, keys: Tuple[str, ...], jsonb: bool = False):
+        # `jsonb` views a JSON column with a JSONB variant as JSONB, for the
+        # PostgreSQL half of `jsonb_variant_operator`.
+        document = type_coerce(column, JSONB) if jsonb and not isinstance(column.type, JSONB) else column
+        element = document
+        for key in keys:
+            element = element[key]
+        self.column = column
+        self.keys = keys
+        self.document = document
+        self.element = element
+        # JSONB (PostgreSQL) needs ->> to compare as text; for JSON (SQLite,
+        # MySQL) the subscript already returns a scalar-like expression.
+        self.text = element.astext if isinstance(document.type, JSONB) else element
+
+
+class OperatorSpec:
+    """
+    One registered operator for one column kind.
+
+    `build(target)` (arity 0) or `build(target, operand)` (arity 1) returns
+    the SQL expression; `validate(operand)` raises ValueError/TypeError for
+    operands the operator cannot take. `indexable` records whether the
+    emitted SQL can be served by an index on the target.
+    """
+
+    __slots__ = ("name", "kind", "build", "arity", "validate", "indexable")
+
+    def __init__(self, name: str, kind: str, build: Callable, arity: int = 1,
+                 validate: Optional[Callable[[Any], None]] = None, indexable: bool = False):
+        self.name = name
+        self.kind = kind
+        self.build = build
+        self.arity = arity
+        self.validate = validate
+        self.indexable = indexable
+
+    def __call__(self, target, operand=None):
+        if self.arity == 0:
+            return self.build(target)
+        if self.validate is not None:
+            self.validate(operand)
+        return self.build(target, operand)
+
+    def __repr__(self) -> str:
+        return f"<OperatorSpec {self.name} ({self.kind})>"
+
+
+OPERATOR_REGISTRY: Dict[Tuple[str, str], OperatorSpec] = {}
+# Overrides used when building with `canonical_binds`, where every operand has
+# to be a single bound parameter so a filter shape always compiles the same.
+CANONICAL_REGISTRY: Dict[Tuple[str, str], OperatorSpec] = {}
+
+
+def register_operator(name: str, kinds: Union[str, Tuple[str, ...]], build: Callable, *, arity: int = 1,
+                      validate: Optional[Callable[[Any], None]] = None, indexable: bool = False,
+                      canonical: bool = False) -> None:
+    """
+    Register `build` as operator `name` for one or more column kinds,
+    replacing any existing entry for the same (name, kind).
+
+        register_operator("$ieq", SCALAR_COLUMN, lambda col, v: func.lower(col) == v.lower(),
+                          validate=require_str)
+    """
+    registry = CANONICAL_REGISTRY if canonical else OPERATOR_REGISTRY
+    for kind in (kinds,) if isinstance(kinds, str) else kinds:
+        registry[(name, kind)] = OperatorSpec(name, kind, build, arity, validate, indexable)
+
+
+def get_operator(name: str, kind: str, canonical: bool = False) -> Optional[OperatorSpec]:
+    while kind is not None:
+        if canonical:
+            spec = CANONICAL_REGISTRY.get((name, kind))
+            if spec is not None:
+                return spec
+        spec = OPERATOR_REGISTRY.get((name, kind))
+        if spec is not None:
+            return spec
+        kind = KIND_FALLBACKS.get(kind)
+    return None
+
+
+def jsonb_variant_operator(spec: OperatorSpec, fallback: OperatorSpec) -> OperatorSpec:
+    """
+    `spec`, the operator for the column's kind, for a JSON column with a
+    JSONB variant: built on a JSONB view of the column for PostgreSQL and
+    with `fallback` (the JSON_PATH_LEAF operator) for the other dialects.
+    """
+    def build(leaf, *operand):
+        jsonb_leaf = JsonPathLeaf(leaf.column, leaf.keys, jsonb=True)
+        return JsonbVariantPredicate(spec.build(jsonb_leaf, *operand), fallback.build(leaf, *operand))
+    return OperatorSpec(spec.name, spec.kind, build, spec.arity, spec.validate, spec.indexable)
+
+
+def require_list(value) -> None:
+    if not isinstance(value, (list, tuple)):
+        raise TypeError(f"expected a list, got {type(value).__name__}")
+
+
+def require_pair(value) -> None:
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise TypeError("expected a [low, high] pair")
+
+
+def require_str(value) -> None:
+    if not isinstance(value, str):
+        raise TypeError(f"expected a string, got {type(value).__name__}")
+
+
+def require_str_list(value) -> None:
+    require_list(value)
+    if not all(isinstance(v, str) for v in value):
+        raise TypeError("expected a list of strings")
+
+
+def require_scalar(value) -> None:
+    if isinstance(value, (dict, list)):
+        raise TypeError(f"expected a scalar value, got {type(value).__name__}")
+
+
+def _require_length(value) -> None:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise TypeError("expected a non-negative integer")
+
+
+def _require_path_value(value) -> None:
+    if not isinstance(value, dict) or "path" not in value or "value" not in value:
+        raise TypeError('expected {"path": ..., "value": ...}')
+
+
+def _require_path_values(value) -> None:
+    if not isinstance(value, dict) or "path" not in value or not isinstance(value.get("values"), list):
+        raise TypeError('expected {"path": ..., "values": [...]}')
+
+
+def _require_single_item_dict(value) -> None:
+    if not isinstance(value, dict) or len(value) != 1:
+        raise TypeError('expected {"<path>": <value>}')
+
+
+def _in_operator(column, value):
+    return column.in_(value)
+
+
+def _ncontains_operator(column, value):
+    return ~column.ilike(f"%{value}%")
+
+
+def _startswith_operator(column, value):
+    return column.ilike(f"{value}%")
+
+
+def _endswith_operator(column, value):
+    return column.ilike(f"{value}")
+
+
+def _isempty_operator(column):
+    return column.is_(None)
+
+
+def _isnotempty_operator(column):
+    return column.is_not(None)
+
+
+def _ilike_operator(column, value):
+    return column.ilike(f"%{value}%")
+
+
+def _json_contains_operator(column, value):
+    return column.contains(cast(value, JSONB))
+
+
+# Scalar columns, and JSON columns compared as a whole
+_GENERIC = (SCALAR_COLUMN, JSON_DOCUMENT)
+register_operator("$eq", _GENERIC, _eq_operator, indexable=True)
+register_operator("$ne", _GENERIC, _ne_operator)
+register_operator("$gt", _GENERIC, _gt_operator, validate=require_scalar, indexable=True)
+register_operator("$gte", _GENERIC, _gte_operator, validate=require_scalar, indexable=True)
+register_operator("$lt", _GENERIC, _lt_operator, validate=require_scalar, indexable=True)
+register_operator("$lte", _GENERIC, _lte_operator, validate=require_scalar, indexable=True)
+register_operator("$in", _GENERIC, _in_operator, validate=require_list, indexable=True)
+register_operator("$isanyof", _GENERIC, _isanyof_operator, validate=require_list, indexable=True)
+register_operator("$isanyof", _GENERIC, _isanyof_in_operator, validate=require_list, indexable=True,
+                  canonical=True)
+register_operator("$isempty", _GENERIC, _isempty_operator, arity=0, indexable=True)
+register_operator("$isnotempty", _GENERIC, _isnotempty_operator, arity=0)
+register_operator("$contains", SCALAR_COLUMN, _ilike_operator, validate=require_scalar)
+register_operator("$ncontains", SCALAR_COLUMN, _ncontains_operator, validate=require_scalar)
+register_operator("$startswith", SCALAR_COLUMN, _startswith_operator, validate=require_scalar)
+register_operator("$endswith", SCALAR_COLUMN, _endswith_operator, validate=require_scalar)
+register_operator("$int_between", _GENERIC,
+                  lambda col, bounds: _range_operator(col, bounds[0], bounds[1], Integer), validate=require_pair)
+register_operator("$dt_between", _GENERIC,
+                  lambda col, bounds: _range_operator(col, bounds[0], bounds[1], DateTime), validate=require_pair)
+
+# JSON/JSONB documents
+register_operator("$contains", JSON_DOCUMENT, _json_contains_operator, indexable=True)
+register_operator("$contained_by", JSON_DOCUMENT, _contained_by_operator, indexable=True)
+register_operator("$has_key", JSON_DOCUMENT, _has_key_operator, validate=require_str, indexable=True)
+register_operator("$has_any", JSON_DOCUMENT, _has_any_operator, validate=require_str_list, indexable=True)
+register_operator("$has_all", JSON_DOCUMENT, _has_all_operator, validate=require_str_list, indexable=True)
+register_operator("$path_eq", JSON_DOCUMENT, COMPARISON_OPERATORS["$path_eq"], validate=_require_single_item_dict)
+for _name in ("$path_gt", "$path_gte", "$path_lt", "$path_lte"):
+    register_operator(_name, JSON_DOCUMENT, COMPARISON_OPERATORS[_name], validate=_require_path_value)
+register_operator("$path_in", JSON_DOCUMENT, COMPARISON_OPERATORS["$path_in"], validate=_require_path_values)
+
+def declared_path_type(leaf: JsonPathLeaf) -> Optional[TypeEngine]:
+    """The type declared for the leaf's path in its column's `info`, if any."""
+    declared = leaf.column.info.get(JSON_PATH_TYPES, {}).get(".".join(leaf.keys))
+    return declared() if isinstance(declared, type) else declared
+
+
+def json_value_type(value) -> Optional[TypeEngine]:
+    """The SQL type a JSON operand is compared as: numbers as NUMERIC, booleans as BOOLEAN, else text."""
+    if isinstance(value, bool):
+        return Boolean()
+    if isinstance(value, (int, float)):
+        return Numeric()
+    return None
+
+
+def _cast_may_fail(leaf: JsonPathLeaf, sql_type: TypeEngine) -> bool:
+    """
+    Whether sampling (see `JsonTypeSampler`) saw values at the leaf's path
+    that are not of the JSON type an operand of `sql_type` is, e.g. "n/a"
+    at a path compared as NUMERIC, so a plain cast could fail the query.
+    """
+    kinds = JSON_TYPE_MAP.kinds(leaf.column, leaf.keys)
+    if not kinds:
+        return False
+    expected = "number" if isinstance(sql_type, Numeric) else "boolean" if isinstance(sql_type, Boolean) else None
+    return expected is not None and any(kind not in (expected, "null") for kind in kinds)
+
+
+def _typed_text(leaf: JsonPathLeaf, sql_type: Optional[TypeEngine], declared: bool = False):
+    # CAST(... AS NUMERIC) is the same expression as (...)::numeric, so an
+    # expression index built either way serves the comparison. The sample
+    # only decides whether values the cast cannot take are skipped, which
+    # returns the rows the plain cast returns when it does not fail.
+    if sql_type is None:
+        return leaf.text
+    guarded = not declared and _cast_may_fail(leaf, sql_type)
+    return JsonPathCast(leaf.text, leaf.column, leaf.keys, sql_type, guarded)
+
+
+# The plain comparisons for scalar operators that special-case ""
+_JSON_EQUALITY = {_eq_operator: operators.eq, _ne_operator: operators.ne}
+
+
+def _json_path_compare(leaf: JsonPathLeaf, value, compare: Callable):
+    """
+    Compare the value at a JSON path with `compare` (one of the scalar
+    operators), cast to the declared path type or, failing that, the type
+    of the operand. Strings are compared as text.
+
+    Unlike on columns, `$eq`/`$ne` "" compare with the empty string and
+    null with a JSON null, which is what containment matches on JSONB.
+    """
+    if compare in _JSON_EQUALITY:
+        if value is None:
+            return compare(JsonTypeOf(leaf.column, leaf.keys, leaf.element), "null")
+        if value == "":
+            return _JSON_EQUALITY[compare](leaf.text, "")
+    sql_type = declared_path_type(leaf)
+    declared = sql_type is not None
+    if not declared:
+        sql_type = json_value_type(value)
+    if sql_type is None:
+        value = str(value)
+    return compare(_typed_text(leaf, sql_type, declared), value)
+
+
+def _json_path_in_operator(leaf: JsonPathLeaf, values):
+    sql_type = declared_path_type(leaf)
+    declared = sql_type is not None
+    if isinstance(sql_type, DateTime):
+        # Parsed like `$eq`, so a date matches its whole day
+        typed = _typed_text(leaf, sql_type, declared)
+        return or_(*[_eq_operator(typed, v) for v in values]) if values else false()
+    if not declared:
+        types = {type(json_value_type(v)) for v in values}
+        if len(types) == 1:
+            sql_type = json_value_type(values[0]) if values else None
+    if sql_type is None:
+        return operators.in_op(leaf.text, [str(v) for v in values])
+    return operators.in_op(_typed_text(leaf, sql_type, declared), values)
+
+
+# Values inside a JSON/JSONB column
+register_operator("$eq", JSON_PATH_LEAF, lambda leaf, v: _json_path_compare(leaf, v, _eq_operator),
+                  validate=require_scalar, indexable=True)
+register_operator("$ne", JSON_PATH_LEAF, lambda leaf, v: _json_path_compare(leaf, v, _ne_operator),
+                  validate=require_scalar)
+register_operator("$gt", JSON_PATH_LEAF, lambda leaf, v: _json_path_compare(leaf, v, _gt_operator),
+                  validate=require_scalar, indexable=True)
+register_operator("$gte", JSON_PATH_LEAF, lambda leaf, v: _json_path_compare(leaf, v, _gte_operator),
+                  validate=require_scalar, indexable=True)
+register_operator("$lt", JSON_PATH_LEAF, lambda leaf, v: _json_path_compare(leaf, v, _lt_operator),
+                  validate=require_scalar, indexable=True)
+register_operator("$lte", JSON_PATH_LEAF, lambda leaf, v: _json_path_compare(leaf, v, _lte_operator),
+                  validate=require_scalar, indexable=True)
+register_operator("$in", JSON_PATH_LEAF, _json_path_in_operator, validate=require_list, indexable=True)
+register_operator("$contains", JSON_PATH_LEAF, lambda leaf, v: cast(leaf.text, String).ilike(f"%{v}%"),
+                  validate=require_scalar)
+register_operator("$startswith", JSON_PATH_LEAF, lambda leaf, v: cast(leaf.text, String).ilike(f"{v}%"),
+                  validate=require_scalar)
+register_operator("$endswith", JSON_PATH_LEAF, lambda leaf, v: cast(leaf.text, String).ilike(f"%{v}"),
+                  validate=require_scalar)
+register_operator("$elemMatch", JSON_PATH_LEAF,
+                  lambda leaf, v: JsonElemMatch(leaf.column, leaf.keys, leaf.element, elem_match_conditions(v)),
+                  indexable=True)
+# Array lengths; the expression matches `json_array_length_index` on the path.
+for _name, _compare in (("$size", operators.eq), ("$size_gt", operators.gt), ("$size_gte", operators.ge),
+                        ("$size_lt", operators.lt), ("$size_lte", operators.le)):
+    register_operator(_name, JSON_PATH_LEAF,
+                      lambda leaf, v, compare=_compare: compare(JsonArrayLength(leaf.column, leaf.keys), v),
+                      validate=_require_length, indexable=True)
+# Read through the path's JSON type: SQLite renders `leaf.text` quoted, so
+# it is never NULL there.
+register_operator("$isempty", JSON_PATH_LEAF,
+                  lambda leaf: or_(JsonTypeOf(leaf.column, leaf.keys, leaf.element).is_(None),
+                                   JsonTypeOf(leaf.column, leaf.keys, leaf.element) == "null"), arity=0)
+register_operator("$isnotempty", JSON_PATH_LEAF,
+                  lambda leaf: JsonTypeOf(leaf.column, leaf.keys, leaf.element) != "null", arity=0)
+# `$isempty` cannot tell a missing key from an explicit null; these can.
+register_operator("$missing", JSON_PATH_LEAF,
+                  lambda leaf: JsonTypeOf(leaf.column, leaf.keys, leaf.element).is_(None), arity=0)
+register_operator("$exists", JSON_PATH_LEAF,
+                  lambda leaf: JsonTypeOf(leaf.column, leaf.keys, leaf.element).is_not(None), arity=0)
+register_operator("$isnull", JSON_PATH_LEAF,
+                  lambda leaf: JsonTypeOf(leaf.column, leaf.keys, leaf.element) == "null", arity=0)
+
+
+def _containment_document(keys: Tuple[str, ...], value) -> dict:
+    # ("address", "city"), "Paris" -> {"address": {"city": "Paris"}}
+    document = value
+    for key in reversed(keys):
+        document = {key: document}
+    return document
+
+
+def _compare_by_cast(leaf) -> bool:
+    """
+    Whether to compare through a cast instead of containment: when the path
+    has a declared type, so its expression index is used.
+    """
+    return declared_path_type(leaf) is not None
+
+
+def _jsonb_eq_operator(leaf, value):
+    if _compare_by_cast(leaf):
+        return _json_path_compare(leaf, value, _eq_operator)
+    return leaf.document.contains(_containment_document(leaf.keys, value))
+
+
+def _jsonb_ne_operator(leaf, value):
+    # The complement of `$eq` among documents that have the key, so 5 and
+    # "5" stay different: {"x": 5} matches `$ne "5"`.
+    if _compare_by_cast(leaf):
+        return _json_path_compare(leaf, value, _ne_operator)
+    return and_(_jsonb_exists_operator(leaf), not_(leaf.document.contains(_containment_document(leaf.keys, value))))
+
+
+def _jsonb_in_operator(leaf, values):
+    if _compare_by_cast(leaf):
+        return _json_path_in_operator(leaf, values)
+    return or_(*[leaf.document.contains(_containment_document(leaf.keys, v)) for v in values])
+
+
+def _jsonb_path_in_operator(leaf, values):
+    if _compare_by_cast(leaf):
+        return _json_path_in_operator(leaf, values)
+    # One jsonpath literal, e.g. $."hair" ? (@ == "Brown" || @ == "Red"),
+    # bound as a single parameter whatever the number of values.
+    path = "$" + "".join(f".{json.dumps(key)}" for key in leaf.keys)
+    condition = " || ".join(f"@ == {json.dumps(v)}" for v in values)
+    return leaf.document.op("@?", return_type=Boolean)(cast(f"{path} ? ({condition})", JSONPATH))
+
+
+def _jsonb_exists_operator(leaf):
+    # `?` for a top-level key (GIN jsonb_ops), `@?` for a nested path (both opclasses)
+    if len(leaf.keys) == 1:
+        return leaf.document.has_key(leaf.keys[0])
+    return leaf.document.op("@?", return_type=Boolean)(cast(jsonpath_accessor(leaf.keys), JSONPATH))
+
+
+def _jsonb_missing_operator(leaf):
+    # A NULL document has no keys either
+    return or_(leaf.document.is_(None), ~_jsonb_exists_operator(leaf))
+
+
+def _jsonb_isnull_operator(leaf):
+    # Only an explicit JSON null is contained: {"hair": null}
+    return leaf.document.contains(_containment_document(leaf.keys, None))
+
+
+# Values inside a JSONB column, matched by containment so a GIN index
+# (jsonb_ops or jsonb_path_ops) can serve them. Values are compared as JSON,
+# so 5 and "5" differ, unlike the text comparison of JSON_PATH_LEAF.
+register_operator("$eq", JSONB_PATH_LEAF, _jsonb_eq_operator, validate=require_scalar, indexable=True)
+register_operator("$ne", JSONB_PATH_LEAF, _jsonb_ne_operator, validate=require_scalar)
+register_operator("$in", JSONB_PATH_LEAF, _jsonb_in_operator, validate=require_list, indexable=True)
+register_operator("$in", JSONB_PATH_LEAF, _jsonb_path_in_operator, validate=require_list, indexable=True,
+                  canonical=True)
+
+# Emptiness from key existence and null containment, so the index can serve
+# `$exists`/`$isnull` and the positive half of `$isnotempty`.
+register_operator("$exists", JSONB_PATH_LEAF, _jsonb_exists_operator, arity=0, indexable=True)
+register_operator("$missing", JSONB_PATH_LEAF, _jsonb_missing_operator, arity=0)
+register_operator("$isnull", JSONB_PATH_LEAF, _jsonb_isnull_operator, arity=0, indexable=True)
+register_operator("$isempty", JSONB_PATH_LEAF,
+                  lambda leaf: or_(_jsonb_missing_operator(leaf), _jsonb_isnull_operator(leaf)), arity=0)
+register_operator("$isnotempty", JSONB_PATH_LEAF,
+                  lambda leaf: and_(_jsonb_exists_operator(leaf), ~_jsonb_isnull_operator(leaf)), arity=0,
+                  indexable=True)
@@ -0,0 +1,537 @@
+# fastapi_querybuilder_jsonb/optimizer.py
+
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Integer, Numeric, String
+
+from .catalog import get_model_catalog
+from .nodes import (
+    Aggregate,
+    And,
+    Compare,
+    JsonPathCompare,
+    Never,
+    Node,
+    Not,
+    Or,
+    Quantified,
+    RelationshipCompare,
+    _Group,
+    _Leaf,
+    _freeze,
+    fold,
+)
+from .operators import SCALAR_COLUMN, get_operator, json_path_kind
+from .utils import _adjust_date_range
+
+# Range operator -> (is a lower bound, is strict)
+RANGE_OPERATORS = {
+    "$gt": (True, True),
+    "$gte": (True, False),
+    "$lt": (False, True),
+    "$lte": (False, False),
+}
+
+# Operators that are never true for a NULL column value
+_NOT_NULL_OPERATORS = ("$eq", "$ne", "$in", "$gt", "$gte", "$lt", "$lte")
+
+# Operators that only hold when the value is NULL (or a JSON path is missing or null)
+_NULL_OPERATORS = ("$isempty", "$missing", "$isnull")
+
+# Pairs of arity-0 operators that cannot both hold for the same target
+_EXCLUSIVE_OPERATORS = (
+    ("$isempty", "$isnotempty"),
+    ("$missing", "$exists"),
+    ("$missing", "$isnull"),
+    ("$missing", "$isnotempty"),
+    ("$isnull", "$isnotempty"),
+)
+
+# Operator of the leaf that holds exactly when a leaf does not, NULLs
+# included: NOT (age > 5) and age <= 5 are both unknown for a NULL age.
+INVERSE_OPERATORS = {
+    "$eq": "$ne",
+    "$ne": "$eq",
+    "$gt": "$lte",
+    "$lte": "$gt",
+    "$gte": "$lt",
+    "$lt": "$gte",
+    "$isempty": "$isnotempty",
+    "$isnotempty": "$isempty",
+    "$any": "$none",
+    "$none": "$any",
+}
+
+# Marks a JSON path target, whose operands are compared as their JSON type
+# (numbers as numbers, strings as text).
+_JSON_PATH = object()
+
+
+def optimize_filter_tree(model, tree: Node) -> Node:
+    """
+    Rewrite a parsed filter into a smaller equivalent one before it is
+    compiled:
+
+    - nested `$and`/`$or` of the same kind are flattened
+    - duplicate predicates in a group are dropped
+    - numeric and date ranges on one column in an `$and` keep only the
+      tightest lower and upper bound
+    - `$eq`/`$in` leaves on one column in an `$or`, and `$isanyof` on
+      columns other than dates, become a single `$in`
+    - an `$and` that can never hold (`$gt` 40 with `$lt` 30, `$in` [],
+      `$eq` with `$isempty`, ...) becomes `Never`, and `Never` children
+      are dropped from an `$or`
+
+    Rewrites depend only on the tree and the column types of `model`, so
+    they never change which rows match. The result is an And, like the
+    output of `parse_filter_tree`; see `is_unsatisfiable`. Nested filters
+    of `$any`/`$all`/`$none` are optimized against the related model, and
+    `$any` of an unsatisfiable one is itself unsatisfiable.
+    - `$not`/`$nor` are pushed down to the leaves (De Morgan) and leaves
+      with an inverse operator are inverted (`$gt` becomes `$lte`, `$any`
+      becomes `$none`), so no NOT is left around plain comparisons.
+      Negations stay in place on leaves filtered through EXISTS (compiled
+      as NOT EXISTS), on JSON paths, and on an `$and` whose leaves share
+      one EXISTS.
+    """
+    tree = _optimize_tree(model, tree)
+    if is_unsatisfiable(tree):
+        OPTIMIZER_STATS.record_unsatisfiable()
+    return tree
+
+
+def _optimize_tree(model, tree: Node, subquery: bool = False) -> Node:
+    types = _TargetTypes(model, subquery)
+    tree = fold(tree, lambda node, children: _optimize_node(node, children, types))
+    return tree if isinstance(tree, And) else And([tree])
+
+
+def is_unsatisfiable(tree: Node) -> bool:
+    """Whether an optimized filter was proven to match no rows."""
+    return isinstance(tree, Never) or (
+        isinstance(tree, And) and len(tree.children) == 1 and isinstance(tree.children[0], Never))
+
+
+class OptimizerStats:
+    """Counts filters the optimizer proved empty, e.g. for a metrics endpoint."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.unsatisfiable = 0
+
+    def record_unsatisfiable(self) -> None:
+        with self._lock:
+            self.unsatisfiable += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.unsatisfiable = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"unsatisfiable": self.unsatisfiable}
+
+
+OPTIMIZER_STATS = OptimizerStats()
+
+
+class _TargetTypes:
+    """Column type of each leaf target, looked up once per target."""
+
+    __slots__ = ("model", "subquery", "types")
+
+    def __init__(self, model, subquery: bool = False):
+        self.model = model
+        # Inside a quantifier's subquery every relationship is an EXISTS
+        self.subquery = subquery
+        self.types: Dict[tuple, Any] = {}
+
+    def exists_anchor(self, leaf: _Leaf) -> Optional[tuple]:
+        """The relationship path of the EXISTS a leaf is filtered through, or None if it is joined."""
+        if not isinstance(leaf, RelationshipCompare):
+            return None
+        if self.subquery:
+            return leaf.relationships[:1]
+        catalog = get_model_catalog(self.model)
+        for index, attr in enumerate(leaf.relationships):
+            relationship = catalog.relationships[attr]
+            if catalog.to_many == "exists" and relationship.uselist:
+                return leaf.relationships[:index + 1]
+            catalog = get_model_catalog(relationship.target)
+        return None
+
+    def kind(self, leaf: _Leaf) -> str:
+        """The operator kind the leaf is compiled with (see `operators.get_operator`)."""
+        if isinstance(leaf, JsonPathCompare):
+            return json_path_kind(get_model_catalog(self.model).json_columns[leaf.column])
+        return SCALAR_COLUMN
+
+    def get(self, leaf: _Leaf) -> Any:
+        """The SQLAlchemy type of the compared column, `_JSON_PATH`, or None if unknown."""
+        target = leaf.target
+        if target not in self.types:
+            self.types[target] = self._lookup(leaf)
+        return self.types[target]
+
+    def _lookup(self, leaf: _Leaf) -> Any:
+        if isinstance(leaf, JsonPathCompare):
+            return _JSON_PATH
+        if isinstance(leaf, Aggregate) and leaf.aggregate == "$count":
+            return Integer()
+        if not isinstance(leaf, (Compare, RelationshipCompare, Aggregate)):
+            return None
+        catalog = get_model_catalog(self.model)
+        for attr in getattr(leaf, "relationships", ()):
+            catalog = get_model_catalog(catalog.relationships[attr].target)
+        if leaf.attribute in catalog.json_columns:
+            return None
+        return getattr(catalog.attributes.get(leaf.attribute), "type", None)
+
+
+def _optimize_node(node: Node, children: List[Node], types: _TargetTypes) -> Node:
+    if isinstance(node, Quantified):
+        return _optimize_quantified(node, types.model)
+    if isinstance(node, _Leaf):
+        if (node.operator == "$isanyof" and isinstance(node.value, list)
+                and None not in node.value and _supports_in(types.get(node))
+                and get_operator("$isanyof", types.kind(node)) is not None):
+            node = node.with_operand("$in", node.value)
+        if node.operator == "$in" and node.value == []:
+            return Never()
+        return node
+    if isinstance(node, Not):
+        negated = _negate(children[0], types)
+        if isinstance(negated, Not):
+            return negated  # nothing could be pushed down
+        # The pushed-down tree may now simplify further (ranges, contradictions)
+        return fold(negated, lambda child, grandchildren: _optimize_node(child, grandchildren, types))
+    if not isinstance(node, _Group):
+        return node
+
+    if isinstance(node, And):
+        if any(isinstance(child, Never) for child in children):
+            return Never()
+    elif children:
+        # An Or whose every branch is unsatisfiable is too; one that was empty
+        # to begin with filters nothing, as before.
+        children = [child for child in children if not isinstance(child, Never)]
+        if not children:
+            return Never()
+
+    group = type(node).of(children)
+    if not isinstance(group, _Group):
+        return group
+    children = _dedupe(list(group.children))
+    if isinstance(group, And):
+        children = _cluster_leaves(_intersect_ranges(children, types))
+        if _contradicts(children, types):
+            return Never()
+    else:
+        children = _collapse_equalities(children, types)
+    return type(group).of(children)
+
+
+def _optimize_quantified(node: Quantified, model) -> Node:
+    catalog = get_model_catalog(model)
+    for attr in node.relationships:
+        catalog = get_model_catalog(catalog.relationships[attr].target)
+    child = _optimize_tree(catalog.model, node.child, subquery=True)
+    if node.operator == "$any" and is_unsatisfiable(child):
+        return Never()
+    return Quantified(node.relationships, node.operator, child)
+
+
+def _negate(tree: Node, types: "_TargetTypes") -> Node:
+    """NOT `tree`, with the negation pushed as far down as keeps the meaning."""
+    def combine(node: Node, negated: List[Node]) -> Node:
+        if isinstance(node, _Group):
+            if not node.children or (isinstance(node, And) and _shares_exists(node.children, types)):
+                return Not(node)
+            return (Or if isinstance(node, And) else And).of(negated)
+        if isinstance(node, Not):
+            return node.child
+        if isinstance(node, _Leaf):
+            inverse = INVERSE_OPERATORS.get(node.operator)
+            if inverse is None or isinstance(node, JsonPathCompare) or types.exists_anchor(node) is not None:
+                return Not(node)
+            return node.with_operand(inverse, node.value)
+        return Not(node)
+    return fold(tree, combine)
+
+
+def _shares_exists(children, types: "_TargetTypes") -> bool:
+    """
+    Whether two leaves of an And share one EXISTS (and so must hold for the
+    same related row); splitting them with De Morgan would change that.
+    """
+    anchors = set()
+    for child in children:
+        anchor = types.exists_anchor(child) if isinstance(child, RelationshipCompare) else None
+        if anchor is None:
+            continue
+        if anchor in anchors:
+            return True
+        anchors.add(anchor)
+    return False
+
+
+def _supports_in(column_type: Any) -> bool:
+    return column_type is not None and not isinstance(column_type, DateTime)
+
+
+def _leaf_key(leaf: _Leaf) -> tuple:
+    return (type(leaf), leaf.target, leaf.operator, _freeze(leaf.value))
+
+
+def _dedupe(children: List[Node]) -> List[Node]:
+    seen = set()
+    unique = []
+    for child in children:
+        if isinstance(child, _Leaf):
+            key = _leaf_key(child)
+            if key in seen:
+                continue
+            seen.add(key)
+        unique.append(child)
+    return unique
+
+
+def _bound(leaf: _Leaf, column_type: Any) -> Optional[Any]:
+    """The value a range leaf effectively compares against, or None if it cannot be ordered."""
+    value = leaf.value
+    if isinstance(column_type, DateTime):
+        if not isinstance(value, str):
+            return None
+        try:
+            # The same day-boundary adjustment the operator applies.
+            return _adjust_date_range(_TypedColumn(column_type), value, leaf.operator)[0]
+        except HTTPException:
+            return None  # left for the operator to report
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    # Numbers only order like the database on numeric targets; a String
+    # column compares "5" and "10" as text.
+    if column_type is not _JSON_PATH and not isinstance(column_type, (Integer, Numeric)):
+        return None
+    return value
+
+
+class _TypedColumn:
+    """Stands in for a column where only its `type` is inspected."""
+
+    __slots__ = ("type",)
+
+    def __init__(self, column_type: Any):
+        self.type = column_type
+
+
+def _intersect_ranges(children: List[Node], types: _TargetTypes) -> List[Node]:
+    ranges: Dict[tuple, list] = {}
+    for child in children:
+        if isinstance(child, _Leaf) and child.operator in RANGE_OPERATORS:
+            ranges.setdefault((type(child), child.target), []).append(child)
+
+    dropped = set()
+    for leaves in ranges.values():
+        if len(leaves) < 2:
+            continue
+        column_type = types.get(leaves[0])
+        bounds = [(leaf, _bound(leaf, column_type)) for leaf in leaves]
+        if any(bound is None for _, bound in bounds):
+            continue
+        try:
+            for is_lower in (True, False):
+                side = [(leaf, bound) for leaf, bound in bounds if RANGE_OPERATORS[leaf.operator][0] is is_lower]
+                if len(side) < 2:
+                    continue
+                if is_lower:
+                    # Highest lower bound wins; `>` beats `>=` on a tie.
+                    best = max(side, key=lambda item: (item[1], RANGE_OPERATORS[item[0].operator][1]))
+                else:
+                    best = min(side, key=lambda item: (item[1], not RANGE_OPERATORS[item[0].operator][1]))
+                dropped.update(id(leaf) for leaf, _ in side if leaf is not best[0])
+        except TypeError:
+            continue  # e.g. naive and aware datetimes
+    return [child for child in children if id(child) not in dropped]
+
+
+def _in_values(leaf: _Leaf, column_type: Any) -> Optional[list]:
+    """The values of an `$eq`/`$in` leaf as an `$in` list, or None if it cannot be merged."""
+    if column_type is _JSON_PATH:
+        # Operands are compared as their JSON type, so only one type can be merged.
+        if leaf.operator == "$eq" and leaf.value not in ("", None) and not isinstance(leaf.value, (dict, list)):
+            return [leaf.value]
+        if leaf.operator == "$in" and isinstance(leaf.value, list) and len({_value_kind(v) for v in leaf.value}) == 1:
+            return list(leaf.value) if None not in leaf.value else None
+        return None
+    elif _supports_in(column_type):
+        # `$eq` with "" or null means IS NULL, which IN cannot express.
+        if leaf.operator == "$eq" and leaf.value not in ("", None) and not isinstance(leaf.value, (dict, list)):
+            return [leaf.value]
+    else:
+        return None
+    if leaf.operator == "$in" and isinstance(leaf.value, list) and None not in leaf.value:
+        return list(leaf.value)
+    return None
+
+
+def _collapse_equalities(children: List[Node], types: _TargetTypes) -> List[Node]:
+    groups: Dict[tuple, list] = {}
+    for child in children:
+        if isinstance(child, _Leaf) and child.operator in ("$eq", "$in"):
+            column_type = types.get(child)
+            values = _in_values(child, column_type)
+            if values is not None:
+                kind = _value_kind(values[0]) if column_type is _JSON_PATH and values else None
+                groups.setdefault((type(child), child.target, kind), []).append((child, values))
+
+    replaced: Dict[int, Optional[Node]] = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        values = []
+        seen = set()
+        for _, member_values in members:
+            for value in member_values:
+                key = _freeze(value)
+                if key not in seen:
+                    seen.add(key)
+                    values.append(value)
+        first = members[0][0]
+        replaced[id(first)] = first.with_operand("$in", values)
+        for leaf, _ in members[1:]:
+            replaced[id(leaf)] = None
+
+    if not replaced:
+        return children
+    result = []
+    for child in children:
+        child = replaced.get(id(child), child)
+        if child is not None:
+            result.append(child)
+    return result
+
+
+def _cluster_leaves(children: List[Node]) -> List[Node]:
+    """
+    Move the JSON path and relationship leaves of an And after the other
+    children, ordered by JSON column and relationship path. Leaves on one
+    to-many relationship then sit next to each other and compile to a
+    single EXISTS, so they must hold for the same related row, which is
+    what the checks below assume; leaves on one JSON column can share a
+    jsonpath predicate.
+    """
+    json_paths = [child for child in children if isinstance(child, JsonPathCompare)]
+    related = [child for child in children if isinstance(child, RelationshipCompare)]
+    if not json_paths and not related:
+        return children
+    others = [child for child in children if not isinstance(child, (JsonPathCompare, RelationshipCompare))]
+    return (others + sorted(json_paths, key=lambda leaf: leaf.column)
+            + sorted(related, key=lambda leaf: leaf.relationships))
+
+
+def _value_kind(value: Any) -> type:
+    """str, bool or float (any number), the categories operands are compared in."""
+    return type(value) if isinstance(value, (str, bool)) else float
+
+
+# Collations that compare strings byte by byte, so distinct Python strings never match the same row
+_BINARY_COLLATIONS = ("c", "posix", "binary", "ucs_basic")
+
+
+def _binary_collation(column_type: Any) -> bool:
+    collation = getattr(column_type, "collation", None)
+    if not isinstance(column_type, String) or collation is None:
+        return False
+    collation = collation.lower()
+    return collation in _BINARY_COLLATIONS or collation.endswith(("_bin", "_bin2"))
+
+
+def _same_value(a: Any, b: Any, column_type: Any) -> bool:
+    """
+    Whether two operands may select the same value; True when unsure. The
+    database coerces operands to the column type ("30" and "30.0" both
+    match 30 in an Integer column) and compares text under the column's
+    collation, so only numbers, and strings on a binary-collated String
+    column, are known to differ.
+    """
+    if _is_number(a) and _is_number(b):
+        return a == b
+    if type(a) is str and type(b) is str and _binary_collation(column_type):
+        return a == b
+    return True
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _in_range(value: Any, lower: Optional[tuple], upper: Optional[tuple]) -> bool:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return True
+    if lower is not None and (value < lower[0] or (value == lower[0] and lower[1])):
+        return False
+    if upper is not None and (value > upper[0] or (value == upper[0] and upper[1])):
+        return False
+    return True
+
+
+def _contradicts(children: List[Node], types: _TargetTypes) -> bool:
+    """Whether the leaves of an And on any single target can never hold together."""
+    by_target: Dict[tuple, list] = {}
+    for child in children:
+        if isinstance(child, _Leaf):
+            by_target.setdefault((type(child), child.target), []).append(child)
+
+    for leaves in by_target.values():
+        if len(leaves) < 2:
+            continue
+        operators = {leaf.operator for leaf in leaves}
+        if any(first in operators and second in operators for first, second in _EXCLUSIVE_OPERATORS):
+            return True
+        if any(operator in operators for operator in _NULL_OPERATORS):
+            # `$eq`/`$ne` with "" or null mean IS NULL / IS NOT NULL
+            if any(leaf.operator in _NOT_NULL_OPERATORS and leaf.value not in ("", None) for leaf in leaves):
+                return True
+
+        column_type = types.get(leaves[0])
+        if column_type is None:
+            continue
+
+        # Values allowed by the `$eq`/`$in` leaves, intersected
+        allowed: Optional[list] = None
+        for leaf in leaves if _supports_in(column_type) or column_type is _JSON_PATH else ():
+            values = _in_values(leaf, column_type) if leaf.operator in ("$eq", "$in") else None
+            if values is None:
+                continue
+            if allowed is None:
+                allowed = values
+            else:
+                allowed = [v for v in allowed if any(_same_value(v, w, column_type) for w in values)]
+        if allowed is not None and not allowed:
+            return True
+
+        lower = upper = None
+        for leaf in leaves:
+            if leaf.operator not in RANGE_OPERATORS:
+                continue
+            bound = _bound(leaf, column_type)
+            if bound is None:
+                continue
+            is_lower, strict = RANGE_OPERATORS[leaf.operator]
+            if is_lower:
+                lower = (bound, strict)
+            else:
+                upper = (bound, strict)
+        try:
+            if lower is not None and upper is not None:
+                if lower[0] > upper[0] or (lower[0] == upper[0] and (lower[1] or upper[1])):
+                    return True
+            if allowed and (lower is not None or upper is not None):
+                if not any(_in_range(value, lower, upper) for value in allowed):
+                    return True
+        except TypeError:
+            continue  # e.g. naive and aware datetimes
+    return False
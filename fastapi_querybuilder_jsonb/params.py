@@ -15,3 +15,12 @@ class QueryParams:
 		self.filters = filters
 		self.search = search
 		self.sort = sort
+
+
+async def get_query_params(
+	filters: Optional[str] = Query(None, description="A JSON string representing filter conditions."),
+	sort: Optional[str] = Query(None, description="e.g. name:asc or user__email:desc"),
+	search: Optional[str] = Query(None, description="A string for global search across string fields.")
+) -> QueryParams:
+	"""Async equivalent of `Depends(QueryParams)`; FastAPI runs it on the event loop instead of the threadpool."""
+	return QueryParams(filters=filters, sort=sort, search=search)
@@ -0,0 +1,218 @@
+# fastapi_querybuilder_jsonb/sampler.py
+
+import json
+import logging
+import os
+import tempfile
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, tablesample
+
+from .utils import _ISO_DATETIME
+
+logger = logging.getLogger(__name__)
+
+# Paths nested deeper than this are not recorded.
+MAX_SAMPLE_DEPTH = 8
+
+
+def json_kind(value: Any) -> str:
+    """The JSON type of a value; ISO-8601 date strings count as "datetime"."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "datetime" if _ISO_DATETIME.fullmatch(value) else "string"
+    if isinstance(value, dict):
+        return "object"
+    return "array"
+
+
+def column_key(column: Any) -> str:
+    """`table.column` for a mapped attribute (of the model or an alias of it) or a Column."""
+    columns = getattr(getattr(column, "property", None), "columns", None)
+    expression = columns[0] if columns else getattr(column, "expression", column)
+    # An aliased table is recorded under the table it aliases
+    table = getattr(expression.table, "original", expression.table)
+    return f"{table.name}.{expression.name}"
+
+
+class JsonTypeMap:
+    """
+    Key presence and value types observed per path of JSON/JSONB columns,
+    as `{"table.column": {"sampled": n, "paths": {"a.b": {"present": k,
+    "types": {"number": k}}}}}`.
+
+    `kind()` answers which single type a path holds and `kinds()` which
+    types it holds; the JSON path operators use the latter to decide
+    whether a cast needs a guard against values it cannot take. The map
+    is a plain dict so it can be saved and loaded, letting workers start
+    with the types a previous run sampled.
+    """
+
+    def __init__(self, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._lock = Lock()
+        self._columns: Dict[str, dict] = {}
+
+    def record(self, key: str, documents: Iterable[Any]) -> None:
+        """Replace the entry for column `key` with the stats of `documents`."""
+        sampled = 0
+        paths: Dict[str, dict] = {}
+        for document in documents:
+            sampled += 1
+            stack: List[Tuple[str, Any, int]] = [("", document, 0)]
+            while stack:
+                prefix, value, depth = stack.pop()
+                if not isinstance(value, dict) or depth >= MAX_SAMPLE_DEPTH:
+                    continue
+                for name, child in value.items():
+                    path = f"{prefix}.{name}" if prefix else name
+                    stats = paths.setdefault(path, {"present": 0, "types": {}})
+                    stats["present"] += 1
+                    kind = json_kind(child)
+                    stats["types"][kind] = stats["types"].get(kind, 0) + 1
+                    stack.append((path, child, depth + 1))
+        with self._lock:
+            self._columns[key] = {"sampled": sampled, "paths": paths}
+
+    def path_stats(self, column: Any, keys: Sequence[str]) -> Optional[dict]:
+        entry = self._columns.get(column if isinstance(column, str) else column_key(column))
+        return entry["paths"].get(".".join(keys)) if entry else None
+
+    def kind(self, column: Any, keys: Sequence[str]) -> Optional[str]:
+        """
+        The only non-null type seen at a path, or None when the path was
+        not sampled, was seen fewer than `min_samples` times, or holds
+        values of several types.
+        """
+        if not self._columns:
+            return None
+        stats = self.path_stats(column, keys)
+        if stats is None:
+            return None
+        kinds = [kind for kind in stats["types"] if kind != "null"]
+        if len(kinds) != 1 or stats["types"][kinds[0]] < self.min_samples:
+            return None
+        return kinds[0]
+
+    def kinds(self, column: Any, keys: Sequence[str]) -> Optional[List[str]]:
+        """The non-null types seen at a path, or None when it was not sampled."""
+        if not self._columns:
+            return None
+        stats = self.path_stats(column, keys)
+        if stats is None:
+            return None
+        return [kind for kind in stats["types"] if kind != "null"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._columns.clear()
+
+    def to_dict(self) -> Dict[str, dict]:
+        with self._lock:
+            return json.loads(json.dumps(self._columns))
+
+    def update(self, columns: Dict[str, dict]) -> None:
+        with self._lock:
+            self._columns.update(columns)
+
+    def save(self, path: str) -> None:
+        """Write the map to `path` atomically."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, path: str) -> bool:
+        """Merge the map saved at `path`; returns False if there is none."""
+        try:
+            with open(path) as f:
+                columns = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.update(columns)
+        return True
+
+
+# Consulted by the JSON path operators
+JSON_TYPE_MAP = JsonTypeMap()
+
+
+def sample_json_column(connection: Any, column: Any, sample_size: int = 1000,
+                       percent: float = 1.0) -> List[Any]:
+    """
+    Read up to `sample_size` documents of `column`. PostgreSQL reads a
+    `percent` block sample (TABLESAMPLE SYSTEM) instead of scanning the
+    table; other databases take the first `sample_size` rows.
+    """
+    expression = getattr(column, "expression", column)
+    if connection.dialect.name == "postgresql":
+        expression = tablesample(expression.table, func.system(percent)).c[expression.name]
+    stmt = select(expression).where(expression.is_not(None)).limit(sample_size)
+    return list(connection.execute(stmt).scalars())
+
+
+class JsonTypeSampler:
+    """
+    Samples JSON/JSONB columns into a `JsonTypeMap`, on demand with
+    `refresh()` or periodically in a daemon thread with `start()`. When
+    `path` is set the map is loaded from it on creation and saved to it
+    after every refresh.
+
+        sampler = JsonTypeSampler([User.attributes], path="/var/cache/app/json_types.json")
+        sampler.start(engine, interval=3600)
+    """
+
+    def __init__(self, columns: Sequence[Any], type_map: Optional[JsonTypeMap] = None,
+                 sample_size: int = 1000, percent: float = 1.0, path: Optional[str] = None):
+        self.columns = list(columns)
+        self.type_map = type_map if type_map is not None else JSON_TYPE_MAP
+        self.sample_size = sample_size
+        self.percent = percent
+        self.path = path
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        if path is not None:
+            self.type_map.load(path)
+
+    def refresh(self, engine: Any) -> JsonTypeMap:
+        """Sample every column now, using a connection from the (sync) `engine`."""
+        with engine.connect() as connection:
+            for column in self.columns:
+                documents = sample_json_column(connection, column, self.sample_size, self.percent)
+                self.type_map.record(column_key(column), documents)
+        if self.path is not None:
+            self.type_map.save(self.path)
+        return self.type_map
+
+    def start(self, engine: Any, interval: float = 3600.0) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, args=(engine, interval),
+                              name="querybuilder-json-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, engine: Any, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh(engine)
+            except Exception:
+                logger.exception("JSON type sampling failed")
+            self._stop.wait(interval)
@@ -0,0 +1,56 @@
+# fastapi_querybuilder_jsonb/statement_cache.py
+
+from threading import Lock
+from typing import Any, Dict
+
+from sqlalchemy import event
+
+
+class CompiledCacheStats:
+    """
+    Hit/miss counters for SQLAlchemy's compiled-statement cache.
+
+    SQLAlchemy already compiles each distinct statement shape once per
+    dialect and reuses it; it just does not count. Attach this to an engine
+    to see how often built queries (ideally with `canonical_binds=True`)
+    are served from that cache.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def attach(self, engine: Any) -> None:
+        """Start counting executions on `engine` (sync or async)."""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self._on_execute)
+
+    def detach(self, engine: Any) -> None:
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.remove(sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is None or context.compiled is None:
+            return
+        cache_hit = getattr(context, "cache_hit", None)
+        with self._lock:
+            if cache_hit == context.dialect.CACHE_HIT:
+                self.hits += 1
+            elif cache_hit == context.dialect.CACHE_MISS:
+                self.misses += 1
+            else:
+                self.uncached += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.uncached = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "uncached": self.uncached}
+
+
+# Shared instance for applications that only run one engine.
+COMPILED_CACHE_STATS = CompiledCacheStats()
@@ -1,8 +1,10 @@
+import re
+from functools import lru_cache
 from fastapi import HTTPException
 from sqlalchemy.sql import and_, or_
 from typing import Any, Tuple
-from datetime import datetime, timedelta
-from sqlalchemy import DateTime, JSON
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import DateTime, JSON, Enum, String
 
 
 def is_jsonb_column(column):
@@ -10,22 +12,80 @@ def is_jsonb_column(column):
     from sqlalchemy.dialects.postgresql import JSONB
     return isinstance(column.type, (JSONB, JSON))
 
+
+def is_enum_column(column):
+    """Check if a column is an enum type"""
+    return isinstance(column.type, Enum)
+
+
+def is_string_column(column):
+    """Check if a column is a string type"""
+    return isinstance(column.type, String)
+
+
+def is_integer_column(column):
+    """Check if a column is an integer type"""
+    return hasattr(column.type, "python_type") and column.type.python_type is int
+
+
+def is_boolean_column(column):
+    """Check if a column is a boolean type"""
+    return hasattr(column.type, "python_type") and column.type.python_type is bool
+
+
+# YYYY-MM-DD, optionally followed by T or space, HH:MM[:SS[.ffffff]] and a
+# "Z" or +HH:MM / -HHMM offset. Like strptime, single-digit month, day and
+# time fields are accepted.
+_ISO_DATETIME = re.compile(
+    r"(\d{4})-(\d{1,2})-(\d{1,2})"
+    r"(?:[T ](\d{1,2}):(\d{1,2})(?::(\d{1,2})(?:[.,](\d{1,6})\d*)?)?"
+    r"(?:(Z)|([+-])(\d{2}):?(\d{2}))?)?"
+)
+
+
+@lru_cache(maxsize=2048)
+def _parse_iso_datetime(value: str) -> Tuple[datetime, bool]:
+    """
+    Parse an ISO-8601 date or datetime in a single pass.
+
+    Returns the datetime and whether the input was date-only. A trailing
+    "Z" is accepted and yields a naive datetime, as before; numeric
+    offsets yield an aware one. Results are memoized, so repeated literals
+    (e.g. a long `$isanyof` list) are parsed once.
+    """
+    match = _ISO_DATETIME.fullmatch(value)
+    if match is None:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid date format: {value}")
+
+    year, month, day, hour, minute, second, fraction, _, sign, off_h, off_m = match.groups()
+    try:
+        tzinfo = None
+        if sign is not None:
+            offset = timedelta(hours=int(off_h), minutes=int(off_m))
+            tzinfo = timezone(-offset if sign == "-" else offset)
+        dt = datetime(
+            int(year), int(month), int(day),
+            int(hour or 0), int(minute or 0), int(second or 0),
+            int(fraction.ljust(6, "0")) if fraction else 0,
+            tzinfo=tzinfo,
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid date format: {value}") from None
+    return dt, hour is None
+
+
 def _parse_datetime(value: str) -> datetime:
-    for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%SZ"):
-        try:
-            return datetime.strptime(value, fmt)
-        except ValueError:
-            continue
-    raise HTTPException(
-        status_code=400, detail=f"Invalid date format: {value}")
+    return _parse_iso_datetime(value)[0]
 
 
 def _adjust_date_range(column, value: str, operator: str) -> Tuple[Any, bool]:
     if not isinstance(column.type, DateTime) or not isinstance(value, str):
         return value, False
 
-    dt = _parse_datetime(value)
-    if len(value.split("T")) == 1 and " " not in value:
+    dt, date_only = _parse_iso_datetime(value)
+    if date_only:
         if operator == "$eq":
             return and_(column >= dt, column < dt + timedelta(days=1)), True
         elif operator == "$ne":
@@ -0,0 +1,169 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+import pytest
+from sqlalchemy import JSON, Column, ForeignKey, Numeric, String, Table, create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+from sqlalchemy.pool import StaticPool
+
+from fastapi_querybuilder_jsonb.builder import build_query
+from fastapi_querybuilder_jsonb.generated import json_path_column
+from fastapi_querybuilder_jsonb.params import QueryParams
+
+# JSON on SQLite, JSONB on PostgreSQL
+PortableJSON = JSON().with_variant(JSONB(), "postgresql")
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Department(Base):
+    __tablename__ = "departments"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    roles: Mapped[list["Role"]] = relationship(back_populates="department")
+
+
+class Role(Base):
+    __tablename__ = "roles"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    department_id: Mapped[Optional[int]] = mapped_column(ForeignKey("departments.id"))
+    department: Mapped[Optional[Department]] = relationship(back_populates="roles")
+    users: Mapped[list["User"]] = relationship(back_populates="role")
+
+
+class User(Base):
+    __tablename__ = "users"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    age: Mapped[Optional[int]]
+    is_active: Mapped[bool]
+    created_at: Mapped[datetime]
+    attributes: Mapped[Optional[dict]] = mapped_column(PortableJSON)
+    role_id: Mapped[Optional[int]] = mapped_column(ForeignKey("roles.id"))
+    role: Mapped[Optional[Role]] = relationship(back_populates="users")
+    posts: Mapped[list["Post"]] = relationship(back_populates="author")
+
+
+post_tags = Table(
+    "post_tags",
+    Base.metadata,
+    Column("post_id", ForeignKey("posts.id"), primary_key=True),
+    Column("tag_id", ForeignKey("tags.id"), primary_key=True),
+)
+
+
+class Post(Base):
+    __tablename__ = "posts"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    title: Mapped[str] = mapped_column(String(50))
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    author: Mapped[User] = relationship(back_populates="posts")
+    tags: Mapped[list["Tag"]] = relationship(secondary=post_tags)
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    weight: Mapped[int] = mapped_column("tag_weight")
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    attributes: Mapped[Optional[dict]] = mapped_column(PortableJSON)
+    city: Mapped[Optional[str]] = json_path_column("attributes.city", index=True)
+    score: Mapped[Optional[float]] = json_path_column("attributes.stats.score", Numeric, index=True)
+
+
+class Doc(Base):
+    """JSONB only: compiled for PostgreSQL, never created on SQLite."""
+
+    __tablename__ = "docs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    data: Mapped[Optional[dict]] = mapped_column(JSONB)
+
+
+class JsonpathDoc(Base):
+    __tablename__ = "jsonpath_docs"
+    __querybuilder_json_backend__ = "jsonpath"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    data: Mapped[Optional[dict]] = mapped_column(JSONB)
+
+
+SQLITE_TABLES = [table for table in Base.metadata.sorted_tables if table.name not in ("docs", "jsonpath_docs")]
+
+
+@pytest.fixture(scope="session")
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=SQLITE_TABLES)
+    with Session(engine) as session:
+        eng, ops = Department(name="Eng"), Department(name="Ops")
+        admin = Role(name="admin", department=eng)
+        member = Role(name="member", department=ops)
+        empty = Role(name="empty", department=eng)
+        alice = User(name="Alice", age=30, is_active=True, role=admin, created_at=datetime(2024, 1, 1, 10),
+                     attributes={"hair": "Brown", "score": 85, "tags": [{"name": "a", "weight": 3}],
+                                 "items": [1, 2, 3]})
+        bob = User(name="Bob", age=25, is_active=False, role=member, created_at=datetime(2024, 1, 2, 10),
+                   attributes={"hair": "Blonde", "score": 70.5, "tags": [{"name": "b", "weight": 1}], "items": [1]})
+        carol = User(name="Carol", age=40, is_active=False, role=admin, created_at=datetime(2024, 1, 3, 10),
+                     attributes={"hair": None, "score": 95, "tags": [], "items": []})
+        dave = User(name="Dave", age=None, is_active=True, role=None, created_at=datetime(2024, 1, 4, 10),
+                    attributes=None)
+        light, heavy, mid = Tag(name="light", weight=1), Tag(name="heavy", weight=5), Tag(name="mid", weight=2)
+        session.add_all([
+            empty, alice, bob, carol, dave,
+            Post(title="first", author=alice, tags=[light, heavy]),
+            Post(title="second", author=alice, tags=[mid]),
+            Post(title="third", author=bob),
+            Item(name="nyc", attributes={"city": "NYC", "stats": {"score": 3}}),
+            Item(name="la", attributes={"city": "LA", "stats": {"score": 10}}),
+            Item(name="blank", attributes={"city": ""}),
+            Item(name="none", attributes={}),
+        ])
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def params(filters=None, sort: Optional[str] = None) -> QueryParams:
+    return QueryParams(filters=json.dumps(filters) if filters is not None else None, sort=sort, search=None)
+
+
+@pytest.fixture
+def names(engine):
+    """Build a query for `model` and return the `name` (or `title`) of its rows, sorted unless `sort` is given."""
+    def run(model, filters=None, sort: Optional[str] = None) -> list:
+        stmt = build_query(model, params(filters, sort))
+        with Session(engine) as session:
+            rows = session.execute(stmt).scalars().unique().all()
+        found = [getattr(row, "name", None) or row.title for row in rows]
+        return found if sort else sorted(found)
+    return run
+
+
+def pg_where(model, filters) -> str:
+    """The WHERE clause `build_query` emits for PostgreSQL."""
+    stmt = build_query(model, params(filters))
+    return str(stmt.compile(dialect=postgresql.dialect())).split("WHERE", 1)[-1].strip()
+
+
+def sqlite_where(model, filters) -> str:
+    return str(build_query(model, params(filters))).split("WHERE", 1)[-1].strip()
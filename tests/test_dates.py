@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from conftest import User
+from fastapi import HTTPException
+
+from fastapi_querybuilder_jsonb.utils import _parse_iso_datetime
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-01-02", (datetime(2024, 1, 2), True)),
+    ("2024-1-2", (datetime(2024, 1, 2), True)),
+    ("2024-01-02T9:05", (datetime(2024, 1, 2, 9, 5), False)),
+    ("2024-01-02 09:05:07.5Z", (datetime(2024, 1, 2, 9, 5, 7, 500000), False)),
+    ("2024-01-02T09:05:07+0200", (datetime(2024, 1, 2, 9, 5, 7, tzinfo=timezone(timedelta(hours=2))), False)),
+])
+def test_parse_iso_datetime(value, expected):
+    assert _parse_iso_datetime(value) == expected
+
+
+@pytest.mark.parametrize("value", ["2024/01/02", "2024-13-01", "2024-01-02T25:00", "yesterday"])
+def test_invalid_dates_are_rejected(value):
+    with pytest.raises(HTTPException) as exc:
+        _parse_iso_datetime(value)
+    assert exc.value.status_code == 400
+
+
+def test_a_date_matches_the_whole_day(names):
+    assert names(User, {"created_at": {"$eq": "2024-01-02"}}) == ["Bob"]
+    assert names(User, {"created_at": {"$eq": "2024-1-2"}}) == ["Bob"]
+    assert names(User, {"created_at": {"$ne": "2024-01-02"}}) == ["Alice", "Carol", "Dave"]
+    assert names(User, {"created_at": {"$lte": "2024-01-02"}}) == ["Alice", "Bob"]
+    assert names(User, {"created_at": {"$gt": "2024-01-02"}}) == ["Carol", "Dave"]
+
+
+def test_a_datetime_compares_exactly(names):
+    assert names(User, {"created_at": {"$gt": "2024-01-02T9:00:00"}}) == ["Bob", "Carol", "Dave"]
+    assert names(User, {"created_at": {"$isanyof": ["2024-01-03T10:00:00", "2024-1-4 10:00"]}}) == ["Carol", "Dave"]
@@ -0,0 +1,34 @@
+
+import pytest
+from fastapi import HTTPException
+
+from fastapi_querybuilder_jsonb.core import parse_filter_query
+from fastapi_querybuilder_jsonb.decoder import FilterDecoder
+
+
+def test_brackets_inside_strings_are_not_counted():
+    decoder = FilterDecoder(max_depth=2, max_elements=3)
+    assert decoder.decode('{"name": {"$eq": "[[{{,,,\\"]]"}}') == {"name": {"$eq": '[[{{,,,"]]'}}
+
+
+def test_escaped_backslash_closes_string():
+    decoder = FilterDecoder(max_depth=1)
+    with pytest.raises(HTTPException) as exc:
+        decoder.check_structure('{"a": "\\\\", "b": [1]}')
+    assert exc.value.status_code == 400
+    assert "depth 1" in exc.value.detail
+
+
+def test_element_limit():
+    with pytest.raises(HTTPException) as exc:
+        FilterDecoder(max_elements=5).check_structure("[" + ",".join("1" * 10) + "]")
+    assert "5 elements" in exc.value.detail
+
+
+def test_unterminated_escaped_string_is_rejected():
+    # A run of `\"` pairs with no closing quote made the old tokenizer
+    # backtrack quadratically; at the default 64 KiB it took seconds.
+    raw = '{"a": "' + '\\"' * 32_000
+    with pytest.raises(HTTPException) as exc:
+        parse_filter_query(raw, FilterDecoder())
+    assert exc.value.status_code == 400
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import DeclarativeBase, Mapped, configure_mappers, mapped_column, relationship
+
+from fastapi_querybuilder_jsonb.catalog import _CATALOGS
+from fastapi_querybuilder_jsonb.dependencies import QueryBuilder
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def test_catalog_is_built_once_mappers_are_configured():
+    class Owner(Base):
+        __tablename__ = "owners"
+
+        id: Mapped[int] = mapped_column(primary_key=True)
+        pets: Mapped[list["Pet"]] = relationship(back_populates="owner")
+
+    # Declared before its relationship target exists, so it cannot be configured yet
+    QueryBuilder(Owner)
+    assert Owner not in _CATALOGS
+
+    class Pet(Base):
+        __tablename__ = "pets"
+
+        id: Mapped[int] = mapped_column(primary_key=True)
+        owner_id: Mapped[Optional[int]] = mapped_column(ForeignKey("owners.id"))
+        owner: Mapped[Optional[Owner]] = relationship(back_populates="pets")
+
+    configure_mappers()
+    assert Owner in _CATALOGS
+    assert "pets" in _CATALOGS[Owner].relationships
@@ -0,0 +1,33 @@
+from conftest import Item, pg_where, sqlite_where
+from sqlalchemy.dialects import postgresql
+
+from fastapi_querybuilder_jsonb.generated import json_path_column_ddl
+
+
+def test_filters_on_a_promoted_path_use_its_column(names):
+    assert sqlite_where(Item, {"attributes.city": {"$eq": "LA"}}) == "items.city = :city_1"
+    assert names(Item, {"attributes.city": {"$eq": "LA"}}) == ["la"]
+    assert names(Item, {"attributes.stats.score": {"$gt": 5}}) == ["la"]
+    assert "items.score >" in pg_where(Item, {"attributes.stats.score": {"$gt": 5}})
+
+
+def test_conditions_the_column_cannot_tell_apart_stay_on_the_path(names):
+    # The column is NULL for both a missing key and a JSON null, and a
+    # string operand compares a numeric path as text
+    for filters in ({"attributes.city": {"$exists": True}}, {"attributes.city": {"$eq": ""}},
+                    {"attributes.stats.score": {"$eq": "3"}}):
+        assert "items.city" not in sqlite_where(Item, filters)
+        assert "items.score" not in sqlite_where(Item, filters)
+    assert names(Item, {"attributes.city": {"$exists": True}}) == ["blank", "la", "nyc"]
+    assert "@>" in pg_where(Item, {"attributes.city": {"$eq": ""}})
+
+
+def test_sort_by_a_promoted_path(names):
+    assert names(Item, sort="attributes.stats.score:desc")[:2] == ["la", "nyc"]
+
+
+def test_ddl_adds_the_column_and_its_index():
+    statements = json_path_column_ddl(Item.city, postgresql.dialect())
+    assert statements[0].startswith("ALTER TABLE items ADD COLUMN city")
+    assert "GENERATED ALWAYS AS" in statements[0]
+    assert any(statement.startswith("CREATE INDEX") for statement in statements[1:])
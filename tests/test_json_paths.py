@@ -0,0 +1,108 @@
+import pytest
+from conftest import Doc, JsonpathDoc, User, pg_where
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+
+from fastapi_querybuilder_jsonb.core import apply_jsonb_path_filter
+from fastapi_querybuilder_jsonb.jsonpath import jsonpath_condition
+from fastapi_querybuilder_jsonb.operators import JSON_PATH_TYPES, JSONB_CONTAINMENT
+
+metadata = MetaData()
+typed_docs = Table(
+    "typed_docs", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("data", JSONB, info={JSON_PATH_TYPES: {"score": Integer, "seen": DateTime}}),
+    Column("text_data", JSONB, info={JSONB_CONTAINMENT: False}),
+)
+
+
+def pg(expression) -> str:
+    return str(expression.compile(dialect=postgresql.dialect()))
+
+
+def test_comparisons_are_typed_by_the_operand(names):
+    assert names(User, {"attributes.score": {"$gt": 80}}) == ["Alice", "Carol"]
+    assert names(User, {"attributes.score": {"$lt": 80.5}}) == ["Bob"]
+    assert names(User, {"attributes.score": {"$in": [70.5, 95]}}) == ["Bob", "Carol"]
+    assert "CAST((users.attributes ->> %(param_1)s) AS NUMERIC) > %(param_2)s" in pg_where(
+        User, {"attributes.score": {"$gt": 80}})
+
+
+def test_declared_path_types_emit_the_index_cast():
+    assert pg(apply_jsonb_path_filter(typed_docs.c.data, "score", "$gte", 80)) == \
+        "CAST((typed_docs.data ->> %(data_1)s) AS INTEGER) >= %(param_1)s"
+    # A date matches the whole day, with `$eq` and `$in` alike
+    for operator, operand in (("$eq", "2024-01-05"), ("$in", ["2024-01-05"])):
+        sql = pg(apply_jsonb_path_filter(typed_docs.c.data, "seen", operator, operand))
+        assert sql.count("AS TIMESTAMP WITHOUT TIME ZONE)") == 2
+        assert ">=" in sql and "<" in sql
+
+
+def test_jsonb_equality_is_containment():
+    assert pg(apply_jsonb_path_filter(Doc.data, "hair", "$eq", "Brown")) == "docs.data @> %(data_1)s::JSONB"
+    assert pg(apply_jsonb_path_filter(Doc.data, "hair", "$in", ["a", "b"])).count("@>") == 2
+
+
+def test_jsonb_ne_is_the_complement_of_containment():
+    sql = pg(apply_jsonb_path_filter(Doc.data, "x", "$ne", "5"))
+    assert sql == "(docs.data ? %(data_1)s) AND NOT ((docs.data @> %(data_2)s::JSONB))"
+
+
+def test_containment_opt_out_compares_text():
+    assert pg(apply_jsonb_path_filter(typed_docs.c.text_data, "hair", "$eq", "Brown")) == \
+        "(typed_docs.text_data ->> %(text_data_1)s) = %(param_1)s"
+
+
+def test_variant_columns_read_jsonb_on_postgresql():
+    assert pg_where(User, {"attributes.hair": {"$eq": "Brown"}}) == "(users.attributes @> %(param_1)s::JSONB)"
+    # Operators without a JSONB form still use ->> rather than ->
+    for filters in ({"attributes.score": {"$gt": 80}}, {"attributes.hair": {"$contains": "ow"}}):
+        where = pg_where(User, filters)
+        assert "->>" in where
+        assert " -> " not in where
+
+
+def test_eq_and_ne_are_complements(names):
+    assert names(User, {"attributes.score": {"$eq": 85}}) == ["Alice"]
+    assert names(User, {"attributes.score": {"$ne": 85}}) == ["Bob", "Carol"]
+
+
+def test_jsonpath_backend_combines_conditions_on_a_column():
+    where = pg_where(JsonpathDoc, {"data.score": {"$gte": 80}, "data.color": {"$eq": "red"}})
+    assert where.count("@@") == 1
+    assert jsonpath_condition(("color",), "$eq", "red") == '$."color" == "red"'
+    assert jsonpath_condition(("x",), "$ne", "5") == '(exists($."x") && !($."x" == "5"))'
+
+
+def test_missing_null_and_empty_are_told_apart(names):
+    assert names(User, {"attributes.hair": {"$isnull": True}}) == ["Carol"]
+    assert names(User, {"attributes.hair": {"$missing": True}}) == ["Dave"]
+    assert names(User, {"attributes.hair": {"$exists": True}}) == ["Alice", "Bob", "Carol"]
+    assert names(User, {"attributes.hair": {"$isempty": True}}) == ["Carol", "Dave"]
+
+
+def test_jsonb_existence_uses_key_operators():
+    assert pg(apply_jsonb_path_filter(Doc.data, "hair", "$exists", None)) == "docs.data ? %(data_1)s"
+    assert "@?" in pg(apply_jsonb_path_filter(Doc.data, "a.b", "$exists", None))
+
+
+def test_elem_match(names):
+    assert names(User, {"attributes.tags": {"$elemMatch": {"weight": {"$gte": 2}}}}) == ["Alice"]
+    assert names(User, {"attributes.tags": {"$elemMatch": {"name": "b", "weight": 1}}}) == ["Bob"]
+    assert names(User, {"attributes.items": {"$elemMatch": {"$gt": 2}}}) == ["Alice"]
+    assert "@?" in pg(apply_jsonb_path_filter(Doc.data, "tags", "$elemMatch", {"name": "a"}))
+
+
+def test_array_size(names):
+    assert names(User, {"attributes.items": {"$size": 3}}) == ["Alice"]
+    assert names(User, {"attributes.items": {"$size_gt": 0}}) == ["Alice", "Bob"]
+    # Missing values and non-arrays have no length
+    assert names(User, {"attributes.hair": {"$size_gte": 0}}) == []
+
+
+def test_array_size_rejects_negative_lengths(names):
+    with pytest.raises(HTTPException) as exc:
+        names(User, {"attributes.items": {"$size": -1}})
+    assert exc.value.status_code == 400
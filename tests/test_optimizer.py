@@ -0,0 +1,81 @@
+import pytest
+from conftest import Role, User, params, pg_where, sqlite_where
+
+from fastapi_querybuilder_jsonb.builder import build_query, is_empty_result
+
+
+def test_or_of_equalities_becomes_in(names):
+    filters = {"$or": [{"name": {"$eq": "Alice"}}, {"name": {"$eq": "Bob"}}]}
+    assert "users.name IN" in sqlite_where(User, filters)
+    assert names(User, filters) == ["Alice", "Bob"]
+
+
+def test_isanyof_with_null_keeps_its_or(names):
+    filters = {"age": {"$isanyof": [30, None]}}
+    assert " IN " not in sqlite_where(User, filters)
+    assert names(User, filters) == ["Alice", "Dave"]
+    assert names(User, {"name": {"$isanyof": ["Bob", None]}}) == ["Bob"]
+
+
+def test_ranges_on_one_column_merge(names):
+    filters = {"age": {"$gt": 20, "$gte": 30, "$lt": 50}}
+    where = sqlite_where(User, filters)
+    assert where.count("users.age") == 2
+    assert names(User, filters) == ["Alice", "Carol"]
+
+
+def test_duplicate_conditions_are_deduplicated():
+    where = sqlite_where(User, {"$and": [{"age": {"$gt": 20}}, {"age": {"$gt": 20}}]})
+    assert where.count("users.age") == 1
+
+
+@pytest.mark.parametrize("filters", [
+    {"age": {"$gt": 30, "$lt": 20}},
+    {"age": {"$eq": 30}, "$and": [{"age": {"$eq": 25}}]},
+    {"age": {"$in": []}},
+    {"$or": [{"age": {"$in": []}}, {"age": {"$gt": 5, "$lt": 1}}]},
+])
+def test_contradictions_are_marked_empty(names, filters):
+    assert is_empty_result(build_query(User, params(filters)))
+    assert names(User, filters) == []
+
+
+def test_satisfiable_filters_are_not_marked_empty(names):
+    filters = {"age": {"$gte": 30, "$lte": 30}}
+    assert not is_empty_result(build_query(User, params(filters)))
+    assert names(User, filters) == ["Alice"]
+
+
+def test_string_equalities_are_left_to_the_collation(names):
+    # "Alice" and "alice" are equal under a case-insensitive collation
+    filters = {"name": {"$eq": "Alice"}, "$and": [{"name": {"$eq": "alice"}}]}
+    assert not is_empty_result(build_query(User, params(filters)))
+
+
+def test_empty_or_filters_nothing(names):
+    assert names(User, {"$or": []}) == ["Alice", "Bob", "Carol", "Dave"]
+    assert names(User, {"$and": [{"$or": []}, {"age": {"$gt": 20}}]}) == ["Alice", "Bob", "Carol"]
+
+
+def test_not_is_pushed_down_to_the_comparison(names):
+    filters = {"$not": {"age": {"$gte": 30}}}
+    assert "NOT" not in pg_where(User, filters)
+    # Like SQL's NOT, a NULL age matches neither side
+    assert names(User, filters) == ["Bob"]
+
+
+def test_nor_matches_none_of_its_conditions(names):
+    filters = {"$nor": [{"name": {"$eq": "Alice"}}, {"age": {"$lt": 30}}]}
+    assert names(User, filters) == ["Carol"]
+
+
+def test_not_on_a_to_many_relationship_is_not_exists(names):
+    filters = {"$not": {"users.name": {"$eq": "Alice"}}}
+    assert "NOT (EXISTS" in pg_where(Role, filters)
+    assert names(Role, filters) == ["empty", "member"]
+
+
+def test_not_keeps_conditions_on_one_related_row_together(names):
+    # No admin user is both named Alice and older than 35, so no role is excluded
+    filters = {"$not": {"users.name": {"$eq": "Alice"}, "users.age": {"$gt": 35}}}
+    assert names(Role, filters) == ["admin", "empty", "member"]
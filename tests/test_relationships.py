@@ -0,0 +1,74 @@
+from conftest import Department, Post, Role, User, pg_where
+
+
+def test_to_many_filter_is_an_exists_semi_join(names):
+    filters = {"users.is_active": {"$eq": False}}
+    where = pg_where(Role, filters)
+    assert "EXISTS" in where
+    assert "JOIN" not in where
+    # One row per role, however many users match
+    assert names(Role, filters) == ["admin", "member"]
+
+
+def test_conditions_on_one_relationship_hold_for_the_same_row(names):
+    # Alice is 30 and Carol is 40, but no admin is both
+    assert names(Role, {"users.name": {"$eq": "Alice"}, "users.age": {"$gt": 35}}) == []
+    assert names(Role, {"users.name": {"$eq": "Carol"}, "users.age": {"$gt": 35}}) == ["admin"]
+
+
+def test_to_one_filter_through_to_many(names):
+    assert names(Department, {"roles.users.name": {"$eq": "Bob"}}) == ["Ops"]
+
+
+def test_any_all_none(names):
+    assert names(Role, {"users": {"$any": {"is_active": {"$eq": True}}}}) == ["admin"]
+    # `$all` holds for a role without users
+    assert names(Role, {"users": {"$all": {"is_active": {"$eq": False}}}}) == ["empty", "member"]
+    assert names(User, {"role": {"$none": {}}}) == ["Dave"]
+    assert names(Department, {"roles.users": {"$none": {"name": {"$eq": "Bob"}}}}) == ["Eng"]
+
+
+def test_all_is_not_exists_on_failing_rows(names):
+    filters = {"users": {"$all": {"age": {"$gt": 26}}}}
+    assert "NOT (EXISTS" in pg_where(Role, filters)
+    # Bob (25) fails, so only admin (30, 40) and the user-less role qualify
+    assert names(Role, filters) == ["admin", "empty"]
+
+
+def test_nested_quantifiers(names):
+    filters = {"roles": {"$any": {"users": {"$any": {"age": {"$lt": 28}}}}}}
+    assert names(Department, filters) == ["Ops"]
+
+
+def test_unsatisfiable_any_matches_nothing(names):
+    assert names(Role, {"users": {"$any": {"age": {"$gt": 50, "$lt": 10}}}}) == []
+
+
+def test_count_aggregate(names):
+    assert names(Role, {"users": {"$count": {"$gte": 2}}}) == ["admin"]
+    # Roles without users count zero
+    assert names(Role, {"users": {"$count": {"$eq": 0}}}) == ["empty"]
+
+
+def test_column_aggregates(names):
+    assert names(Role, {"users.age": {"$max": {"$gt": 35}}}) == ["admin"]
+    assert names(Role, {"users.age": {"$min": {"$lt": 28}}}) == ["member"]
+    assert names(User, {"posts": {"$count": {"$gt": 1}}}) == ["Alice"]
+
+
+def test_aggregate_sort(names):
+    assert names(Role, sort="users.$count:desc")[0] == "admin"
+
+
+def test_many_to_many_aggregates(names):
+    assert names(Post, {"tags": {"$count": {"$gte": 2}}}) == ["first"]
+    assert names(Post, {"tags.weight": {"$sum": {"$gt": 2}}}) == ["first"]
+    assert names(Post, {"tags.weight": {"$max": {"$lt": 3}}}) == ["second"]
+    assert names(Post, sort="tags.$count:desc") == ["first", "second", "third"]
+
+
+def test_many_to_many_aggregate_correlates_through_the_secondary_table():
+    where = pg_where(Post, {"tags.weight": {"$sum": {"$gt": 2}}})
+    assert "FROM post_tags AS post_tags_1 JOIN tags AS tags_1 ON tags_1.id = post_tags_1.tag_id" in where
+    assert "WHERE posts.id = post_tags_1.post_id" in where
+    assert "sum(tags_1.tag_weight)" in where
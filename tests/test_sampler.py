@@ -0,0 +1,57 @@
+import pytest
+from conftest import User, pg_where
+
+from fastapi_querybuilder_jsonb.sampler import JSON_TYPE_MAP, JsonTypeMap, JsonTypeSampler
+
+
+@pytest.fixture
+def sampled():
+    """Record `documents` as the sample of users.attributes for one test."""
+    def record(documents):
+        JSON_TYPE_MAP.record("users.attributes", documents)
+    yield record
+    JSON_TYPE_MAP.clear()
+
+
+def test_unsampled_paths_cast_plainly():
+    assert "CASE" not in pg_where(User, {"attributes.score": {"$gt": 80}})
+
+
+def test_mixed_samples_guard_the_cast(sampled, names):
+    sampled([{"score": 1}, {"score": "n/a"}])
+    where = pg_where(User, {"attributes.score": {"$gt": 80}})
+    assert "CASE WHEN" in where and "~*" in where
+    # The guard only skips values the cast cannot take
+    assert names(User, {"attributes.score": {"$gt": 80}}) == ["Alice", "Carol"]
+
+
+def test_uniform_samples_cast_plainly(sampled):
+    sampled([{"score": 1}, {"score": 2.5}, {"score": None}])
+    assert "CASE" not in pg_where(User, {"attributes.score": {"$gt": 80}})
+
+
+def test_samples_never_change_equality(sampled):
+    before = pg_where(User, {"attributes.hair": {"$eq": "Brown"}})
+    sampled([{"hair": 1}, {"hair": "Brown"}])
+    assert pg_where(User, {"attributes.hair": {"$eq": "Brown"}}) == before == "(users.attributes @> %(param_1)s::JSONB)"
+
+
+def test_refresh_records_the_column(engine):
+    type_map = JsonTypeMap(min_samples=1)
+    JsonTypeSampler([User.attributes], type_map=type_map).refresh(engine)
+    assert type_map.kind(User.attributes, ("hair",)) == "string"
+    assert sorted(type_map.kinds(User.attributes, ("tags",))) == ["array"]
+    assert type_map.kind(User.attributes, ("missing",)) is None
+    # The shared map is left alone
+    assert JSON_TYPE_MAP.kinds(User.attributes, ("hair",)) is None
+
+
+def test_save_and_load(tmp_path):
+    type_map = JsonTypeMap()
+    type_map.record("users.attributes", [{"a": 1}])
+    path = str(tmp_path / "types.json")
+    type_map.save(path)
+    loaded = JsonTypeMap()
+    assert loaded.load(path)
+    assert loaded.kinds("users.attributes", ("a",)) == ["number"]
+    assert not JsonTypeMap().load(str(tmp_path / "missing.json"))